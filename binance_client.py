@@ -0,0 +1,209 @@
+import logging
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Optional
+
+import requests
+from binance.client import Client
+from binance.exceptions import BinanceAPIException, BinanceRequestException
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from http_session import ler_json
+
+logger = logging.getLogger(__name__)
+
+POOL_CONEXOES = 32
+INTERVALO_PING = 30  # segundos entre pings para manter a conexão TLS aquecida
+
+# Validade (ms) de uma ordem assinada: com o relógio sincronizado com o da
+# Binance, uma janela curta impede que uma ordem atrasada na rede seja
+# executada segundos depois, a um preço já diferente
+RECV_WINDOW_ORDENS = 5000
+
+# Limite de peso das requisições REST por IP na Binance, por minuto
+PESO_MAXIMO_MINUTO = 1200
+
+# Limite de ordens novas por conta na Binance: 50 a cada 10 segundos
+ORDENS_MAXIMAS = 50
+JANELA_ORDENS = 10
+
+# Endpoints que criam ordens (contam no limite de ordens, além do de peso)
+ENDPOINTS_ORDENS = ("order", "order/oco", "orderList/oco")
+
+# Peso de cada endpoint (documentação da Binance); os demais pesam 1
+PESOS_ENDPOINTS: Dict[str, int] = {
+    "exchangeInfo": 20,
+    "account": 20,
+    "myTrades": 20,
+    "allOrders": 20,
+    "openOrders": 6,
+    "depth": 5,
+    "klines": 2,
+    "ticker/price": 2,
+    "ticker/24hr": 2,
+}
+
+
+class LimitadorPeso:
+    """
+    Token bucket do peso das requisições: a capacidade se recompõe de forma
+    contínua ao longo da janela (um minuto, por padrão). Quem reserva mais do
+    que há disponível recebe o tempo que precisa esperar, em vez de estourar o
+    limite e levar um 429.
+    """
+
+    def __init__(self, peso_por_janela: int = PESO_MAXIMO_MINUTO, janela: float = 60):
+        self.capacidade = float(peso_por_janela)
+        self.por_segundo = peso_por_janela / janela
+        self._tokens = self.capacidade
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _recompor(self, agora: float) -> None:
+        self._tokens = min(
+            self.capacidade, self._tokens + (agora - self._ultimo) * self.por_segundo
+        )
+        self._ultimo = agora
+
+    def reservar(self, peso: int) -> float:
+        """
+        Reserva o peso e retorna quantos segundos esperar antes de enviar a
+        requisição (0 se houver capacidade). Não bloqueia: serve também para
+        código assíncrono, que espera com asyncio.sleep.
+        """
+        with self._lock:
+            self._recompor(time.monotonic())
+            self._tokens -= peso
+            return max(0.0, -self._tokens / self.por_segundo)
+
+    def aguardar(self, peso: int) -> None:
+        espera = self.reservar(peso)
+        if espera > 0:
+            logger.debug("Limite de peso da Binance: aguardando %.2fs", espera)
+            time.sleep(espera)
+
+    def sincronizar(self, peso_usado: int) -> None:
+        """
+        Ajusta a capacidade ao peso usado informado pela Binance
+        (X-MBX-USED-WEIGHT-1M), que inclui outros processos no mesmo IP.
+        """
+        with self._lock:
+            self._recompor(time.monotonic())
+            self._tokens = min(self._tokens, self.capacidade - peso_usado)
+
+
+# Compartilhados por todas as requisições REST à Binance do processo
+limitador_binance = LimitadorPeso()
+limitador_ordens = LimitadorPeso(ORDENS_MAXIMAS, janela=JANELA_ORDENS)
+
+
+def peso_requisicao(uri: str) -> int:
+    caminho = uri.split("?", 1)[0]
+    for endpoint, peso in PESOS_ENDPOINTS.items():
+        if caminho.endswith(endpoint):
+            return peso
+    return 1
+
+
+@lru_cache(maxsize=1)
+def get_client(
+    api_key: Optional[str] = None,
+    api_secret: Optional[str] = None,
+    manter_conexao: bool = True,
+) -> Client:
+    """
+    Retorna um Client da Binance compartilhado por todo o processo, com pool
+    de conexões HTTP keep-alive e retentativas automáticas.
+    """
+    client = Client(api_key=api_key, api_secret=api_secret)
+
+    # Sem POST nas retentativas: reenviar uma ordem poderia duplicá-la
+    retry = Retry(
+        total=3,
+        backoff_factor=0.1,
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "DELETE"}),
+        respect_retry_after_header=True,
+    )
+    # Poucos hosts (api.binance.com), muitas conexões simultâneas para cada um
+    adapter = HTTPAdapter(
+        pool_connections=4, pool_maxsize=POOL_CONEXOES, max_retries=retry
+    )
+    client.session.mount("https://", adapter)
+    _limitar_requisicoes(client)
+    # Respostas decodificadas direto dos bytes (orjson, se instalado)
+    client._handle_response = _tratar_resposta
+    sincronizar_relogio(client)
+
+    if manter_conexao:
+        _iniciar_keepalive(client)
+
+    return client
+
+
+def _tratar_resposta(response: requests.Response):
+    # Mesma semântica de Client._handle_response, trocando response.json()
+    if not (200 <= response.status_code < 300):
+        raise BinanceAPIException(response, response.status_code, response.text)
+    try:
+        return ler_json(response.content)
+    except ValueError:
+        raise BinanceRequestException(f"Invalid Response: {response.text}")
+
+
+def _limitar_requisicoes(client: Client) -> None:
+    """
+    Faz toda requisição REST do client passar pelo limitador de peso antes de
+    sair, e sincroniza o limitador com o peso usado devolvido pela Binance.
+    """
+    requisicao = client._request
+
+    def _request(method, uri: str, signed: bool, force_params: bool = False, **kwargs):
+        limitador_binance.aguardar(peso_requisicao(uri))
+        if method == "post" and uri.endswith(ENDPOINTS_ORDENS):
+            limitador_ordens.aguardar(1)
+        try:
+            return requisicao(method, uri, signed, force_params, **kwargs)
+        finally:
+            response = getattr(client, "response", None)
+            usado = response is not None and response.headers.get(
+                "x-mbx-used-weight-1m"
+            )
+            if usado:
+                limitador_binance.sincronizar(int(usado))
+
+    client._request = _request
+
+
+def sincronizar_relogio(client: Client) -> None:
+    """
+    Ajusta o timestamp das requisições assinadas ao relógio da Binance
+    (client.timestamp_offset), descontando metade do tempo de ida e volta.
+    Sem isso, um relógio local adiantado ou atrasado faz as ordens serem
+    recusadas por estarem fora do recvWindow.
+    """
+    try:
+        inicio = time.time() * 1000
+        servidor = client.get_server_time()["serverTime"]
+        fim = time.time() * 1000
+    except Exception as e:
+        logger.warning(f"Não foi possível sincronizar o relógio com a Binance: {e}")
+        return
+    client.timestamp_offset = int(servidor - (inicio + fim) / 2)
+
+
+def _iniciar_keepalive(client: Client) -> None:
+    """
+    Inicia uma thread daemon que consulta a API periodicamente, evitando que
+    a conexão ociosa seja fechada e um novo handshake TLS seja necessário. A
+    consulta é a hora do servidor, que também corrige o desvio do relógio.
+    """
+
+    def loop() -> None:
+        while True:
+            time.sleep(INTERVALO_PING)
+            sincronizar_relogio(client)
+
+    threading.Thread(target=loop, name="binance-keepalive", daemon=True).start()
@@ -0,0 +1,73 @@
+import logging
+import math
+from decimal import Decimal
+from typing import Dict, Iterable
+
+from binance.client import Client
+
+from binance_client import get_client
+from config import BotConfig
+from exchange_info import obter_exchange_info
+
+logger = logging.getLogger(__name__)
+
+
+def casas_decimais_do_step(step_size: str) -> int:
+    """
+    Converte o stepSize (ex: "0.00100000") no número de casas decimais.
+    """
+    step = float(step_size)
+    casas = int(round(-math.log10(step)))
+
+    # Caminho rápido: stepSize potência de dez (o caso comum na Binance)
+    if step == 10.0**-casas:
+        return max(0, casas)
+
+    # Demais valores (ex: "0.05000000"): expoente decimal exato
+    return max(0, -Decimal(step_size).normalize().as_tuple().exponent)
+
+
+def obter_casas_decimais_para_moedas(
+    client: Client, moedas: Iterable[str]
+) -> Dict[str, int]:
+    """
+    Retorna o número de casas decimais permitido na quantidade de cada moeda,
+    com base no stepSize do filtro LOT_SIZE.
+    """
+    # Remove espaços e duplicatas vindos da configuração
+    moedas = frozenset(moeda.strip() for moeda in moedas)
+
+    # Uma única passada pelo exchange info, apenas nos símbolos pedidos
+    sym_to_step = {
+        si["symbol"]: next(
+            (f["stepSize"] for f in si["filters"] if f["filterType"] == "LOT_SIZE"),
+            None,
+        )
+        for si in obter_exchange_info(client)["symbols"]
+        if si["symbol"] in moedas
+    }
+
+    for moeda in moedas - sym_to_step.keys():
+        logger.warning(f"Símbolo {moeda} não encontrado no exchange info.")
+
+    casas = {}
+    for s, step in sym_to_step.items():
+        if step is None:
+            logger.warning(f"LOT_SIZE não encontrado para o símbolo {s}.")
+            continue
+        casas[s] = casas_decimais_do_step(step)
+    return casas
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    config = BotConfig.load()
+
+    client = get_client(
+        config.binance_api_key, config.binance_secret_key, manter_conexao=False
+    )
+
+    casas_decimais = obter_casas_decimais_para_moedas(client, config.simbolos)
+
+    # Linha pronta para ser copiada para o .env
+    print(f"CASAS_DECIMAIS = {casas_decimais}")
@@ -0,0 +1,71 @@
+import ast
+import json
+import os
+from dataclasses import dataclass
+from functools import cache
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# Cache gravado por get_min_notional.py, usado quando MIN_NOTIONAL não está no .env
+NOTIONAL_MINIMO_FILE = "notional_minimo.json"
+
+
+def _parse_dict(valor: Optional[str]) -> dict:
+    """
+    Converte a string de uma variável de ambiente em dicionário.
+    Tenta JSON primeiro (parser em C) e cai para ast.literal_eval para aceitar
+    o formato de dicionário Python (ex: vírgula no final).
+    """
+    if not valor:
+        return {}
+    try:
+        return json.loads(valor)
+    except ValueError:
+        return ast.literal_eval(valor)
+
+
+def _carregar_notional_minimo(valor: Optional[str]) -> dict:
+    """
+    Usa MIN_NOTIONAL do ambiente se definido; senão, o cache em disco.
+    """
+    if valor:
+        return _parse_dict(valor)
+    try:
+        with open(NOTIONAL_MINIMO_FILE, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+@dataclass(frozen=True, slots=True)
+class BotConfig:
+    binance_api_key: Optional[str]
+    binance_secret_key: Optional[str]
+    openai_api_key: Optional[str]
+    cryptocompare_api_key: Optional[str]
+    symbols: Dict[str, str]
+    casas_decimais: Dict[str, int]
+    min_notional: Dict[str, float]
+    simbolos: Tuple[str, ...]
+
+    @classmethod
+    @cache
+    def load(cls) -> "BotConfig":
+        """
+        Lê o .env e as variáveis de ambiente uma única vez por processo.
+        """
+        load_dotenv()
+
+        symbols = _parse_dict(os.getenv("SYMBOLS"))
+
+        return cls(
+            binance_api_key=os.getenv("BINANCE_API_KEY"),
+            binance_secret_key=os.getenv("BINANCE_SECRET_KEY"),
+            openai_api_key=os.getenv("OPENAI_API_KEY"),
+            cryptocompare_api_key=os.getenv("CRYPTOCOMPARE_API_KEY"),
+            symbols=symbols,
+            casas_decimais=_parse_dict(os.getenv("CASAS_DECIMAIS")),
+            min_notional=_carregar_notional_minimo(os.getenv("MIN_NOTIONAL")),
+            simbolos=tuple(symbols),
+        )
@@ -1,15 +1,62 @@
+import asyncio
 import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+import aiohttp
+import numpy as np
 import pandas as pd
 from binance.client import Client
 from binance.exceptions import BinanceAPIException, BinanceRequestException
 
+from binance_client import limitador_binance, peso_requisicao
+from http_session import ler_json
+
 logger = logging.getLogger(__name__)
 
+BINANCE_KLINES_URL = "https://api.binance.com/api/v3/klines"
+
+# Colunas numéricas usadas das klines (posições 1 a 5 de cada kline)
+OHLCV_COLUNAS = ["open", "high", "low", "close", "volume"]
+
+# Duração em segundos de cada unidade dos intervalos de kline da Binance
+_SEGUNDOS_POR_UNIDADE = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def _interval_seconds(interval: str) -> int:
+    """
+    Converte um intervalo de kline da Binance (ex: "1m", "4h", "1d") em segundos.
+    O intervalo mensal ("1M") é aproximado para 30 dias.
+    """
+    if interval.endswith("M"):
+        return int(interval[:-1]) * 30 * 86400
+    return int(interval[:-1]) * _SEGUNDOS_POR_UNIDADE[interval[-1]]
+
 
 class DataHandler:
-    def __init__(self, client: Client, interval: str):
+    def __init__(
+        self,
+        client: Client,
+        interval: str,
+        max_conexoes: int = 32,
+        max_cache: int = 128,
+    ):
         self.client = client
         self.interval = interval
+        self.max_conexoes = max_conexoes
+        self._session = None
+
+        # Cache das klines por (símbolo, intervalo, limite, vela atual): os dados
+        # só mudam quando uma nova vela começa
+        self.max_cache = max_cache
+        self._kline_cache: "OrderedDict[Tuple, pd.DataFrame]" = OrderedDict()
+        self._lock_cache = threading.Lock()
+
+        # Última janela completa por (símbolo, intervalo, limite): na vela
+        # seguinte só as klines novas são buscadas e encaixadas no final dela
+        self._janelas: Dict[Tuple, pd.DataFrame] = {}
 
     def obter_dados_mercado(self, symbol: str, limit: int = 1000) -> pd.DataFrame:
         try:
@@ -20,40 +67,246 @@ class DataHandler:
             logger.error(f"[{symbol}] Erro inesperado: {e}")
         return pd.DataFrame()
 
+    def obter_dados_mercados(
+        self, symbols: Iterable[str], limit: int = 1000
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Obtém os dados de mercado de vários símbolos em paralelo.
+        Retorna um dicionário símbolo -> DataFrame.
+        """
+        return asyncio.run(self.obter_dados_mercados_async(symbols, limit))
+
+    async def obter_dados_mercados_async(
+        self, symbols: Iterable[str], limit: int = 1000, manter_sessao: bool = False
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Com manter_sessao, a sessão aiohttp (e suas conexões keep-alive) fica
+        aberta para as próximas chamadas no mesmo event loop; quem chama fica
+        responsável por fechar() ao terminar.
+        """
+        symbols = tuple(symbols)
+        try:
+            dfs = await asyncio.gather(
+                *[self.obter_dados_mercado_async(s, limit) for s in symbols]
+            )
+        finally:
+            if not manter_sessao:
+                await self.fechar()
+        return dict(zip(symbols, dfs))
+
+    async def obter_dados_mercado_async(
+        self, symbol: str, limit: int = 1000
+    ) -> pd.DataFrame:
+        """
+        Versão assíncrona de obter_dados_mercado, usando aiohttp diretamente no
+        endpoint de klines para permitir várias requisições simultâneas.
+        """
+        chave = self._chave_cache(symbol, self.interval, limit)
+        df = self._obter_do_cache(chave)
+        if df is not None:
+            return df
+
+        try:
+            busca = self._limite_busca(symbol, self.interval, limit)
+            df = await self._buscar_klines_async(symbol, busca)
+            df = self._mesclar_janela(symbol, self.interval, limit, busca, df)
+            if df is None:
+                # Buraco entre a janela anterior e as velas novas
+                df = await self._buscar_klines_async(symbol, limit)
+            return self._salvar_no_cache(chave, df)
+        except aiohttp.ClientError as e:
+            logger.error(f"[{symbol}] Erro na API da Binance: {e}")
+        except Exception as e:
+            logger.error(f"[{symbol}] Erro inesperado: {e}")
+        return pd.DataFrame()
+
+    async def _buscar_klines_async(self, symbol: str, limit: int) -> pd.DataFrame:
+        params = {"symbol": symbol, "interval": self.interval, "limit": limit}
+        # Mesmo limitador de peso das chamadas feitas pelo client da Binance
+        espera = limitador_binance.reservar(peso_requisicao(BINANCE_KLINES_URL))
+        if espera > 0:
+            await asyncio.sleep(espera)
+
+        session = self._obter_sessao()
+        async with session.get(BINANCE_KLINES_URL, params=params) as response:
+            usado = response.headers.get("x-mbx-used-weight-1m")
+            if usado:
+                limitador_binance.sincronizar(int(usado))
+            response.raise_for_status()
+            klines = ler_json(await response.read())
+
+        # A construção do DataFrame é bloqueante, roda fora do event loop
+        return await asyncio.to_thread(self._klines_para_dataframe, klines)
+
+    def _obter_sessao(self) -> aiohttp.ClientSession:
+        """
+        Retorna a sessão aiohttp, criando-a no event loop atual se necessário.
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_conexoes, keepalive_timeout=75
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=20)
+            )
+        return self._session
+
+    async def fechar(self) -> None:
+        """
+        Fecha a sessão aiohttp, se estiver aberta.
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
     def _processar_dados(self, symbol: str, limit: int) -> pd.DataFrame:
-        klines = self.client.get_klines(
-            symbol=symbol, interval=self.interval, limit=limit
+        return self._obter_klines_df(symbol, self.interval, limit)
+
+    def _obter_klines_df(self, symbol: str, interval: str, limit: int) -> pd.DataFrame:
+        """
+        Obtém as klines via REST e as converte em DataFrame, reutilizando o
+        resultado enquanto a vela atual não fechar.
+        """
+        chave = self._chave_cache(symbol, interval, limit)
+        df = self._obter_do_cache(chave)
+        if df is not None:
+            return df
+
+        busca = self._limite_busca(symbol, interval, limit)
+        klines = self.client.get_klines(symbol=symbol, interval=interval, limit=busca)
+        df = self._mesclar_janela(
+            symbol, interval, limit, busca, self._klines_para_dataframe(klines)
         )
+        if df is None:
+            # Buraco entre a janela anterior e as velas novas
+            klines = self.client.get_klines(
+                symbol=symbol, interval=interval, limit=limit
+            )
+            df = self._klines_para_dataframe(klines)
+        return self._salvar_no_cache(chave, df)
+
+    def _limite_busca(self, symbol: str, interval: str, limit: int) -> int:
+        """
+        Quantas klines buscar: havendo uma janela anterior completa, apenas as
+        velas desde a última conhecida (que podia estar aberta), com uma de
+        sobreposição; senão, a janela inteira.
+        """
+        with self._lock_cache:
+            anterior = self._janelas.get((symbol, interval, limit))
+        if anterior is None or len(anterior) < limit:
+            return limit
+
+        ultima_ms = anterior.index[-1].value // 1_000_000
+        decorrido_ms = time.time() * 1000 - ultima_ms
+        velas = int(decorrido_ms // (_interval_seconds(interval) * 1000)) + 2
+        return min(max(velas, 2), limit)
+
+    def _mesclar_janela(
+        self, symbol: str, interval: str, limit: int, busca: int, novo: pd.DataFrame
+    ) -> Optional[pd.DataFrame]:
+        """
+        Encaixa as klines novas no final da janela anterior, mantendo as
+        últimas limit velas. As novas substituem as sobrepostas (a última vela
+        anterior podia estar aberta). Retorna None se houver um buraco entre
+        as duas.
+        """
+        if busca >= limit:
+            return novo
+
+        with self._lock_cache:
+            anterior = self._janelas.get((symbol, interval, limit))
+        if anterior is None or novo.empty:
+            return None
+        # As novas devem sobrepor a janela ou começar logo na vela seguinte
+        if novo.index[0] > anterior.index[-1] + pd.Timedelta(
+            seconds=_interval_seconds(interval)
+        ):
+            return None
+
+        corte = anterior.index.searchsorted(novo.index[0])
+        return pd.concat([anterior.iloc[:corte], novo]).iloc[-limit:]
+
+    @staticmethod
+    def _chave_cache(symbol: str, interval: str, limit: int) -> Tuple:
+        bucket = int(time.time() // _interval_seconds(interval))
+        return (symbol, interval, limit, bucket)
+
+    def _obter_do_cache(self, chave: Tuple) -> Optional[pd.DataFrame]:
+        with self._lock_cache:
+            df = self._kline_cache.get(chave)
+            if df is None:
+                return None
+            self._kline_cache.move_to_end(chave)
+
+        # Cópia rasa: o chamador pode adicionar colunas sem alterar o cache
+        return df.copy(deep=False)
+
+    def _salvar_no_cache(self, chave: Tuple, df: pd.DataFrame) -> pd.DataFrame:
+        if df.empty:
+            return df
+
+        with self._lock_cache:
+            self._kline_cache[chave] = df
+            self._kline_cache.move_to_end(chave)
+            self._janelas[chave[:3]] = df
+            while len(self._kline_cache) > self.max_cache:
+                self._kline_cache.popitem(last=False)
+
+        return df.copy(deep=False)
+
+    def _klines_para_dataframe(self, klines: list) -> pd.DataFrame:
+        """
+        Converte a lista de klines da Binance em um DataFrame OHLCV indexado por
+        timestamp. O índice é montado aqui, uma única vez, para que os cálculos
+        de indicadores não precisem refazê-lo a cada chamada.
+        As klines são transpostas em colunas e só os campos usados (timestamp e
+        OHLCV) são convertidos, direto para int64/float64, sem passar por um
+        array de objetos; close_time, ignore, etc. são descartados.
+        """
+        if not klines:
+            return pd.DataFrame(
+                columns=OHLCV_COLUNAS, index=pd.DatetimeIndex([], name="timestamp")
+            )
+
+        colunas = list(zip(*klines))
+        timestamps = pd.to_datetime(np.array(colunas[0], dtype=np.int64), unit="ms")
+
+        # Matriz (campo, vela): transposta é exatamente o bloco float64 que o
+        # pandas guarda internamente, então o DataFrame é montado sem cópia
+        numericos = np.array(colunas[1:6], dtype=np.float64)
 
         df = pd.DataFrame(
-            klines,
-            columns=[
-                "timestamp",
-                "open",
-                "high",
-                "low",
-                "close",
-                "volume",
-                "close_time",
-                "quote_asset_volume",
-                "number_of_trades",
-                "taker_buy_base_asset_volume",
-                "taker_buy_quote_asset_volume",
-                "ignore",
-            ],
+            numericos.T,
+            columns=OHLCV_COLUNAS,
+            index=timestamps.rename("timestamp"),
+            copy=False,
         )
-        df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
-
-        # Ordenar por timestamp para garantir que os dados estejam em ordem cronológica
-        df = df.sort_values(by="timestamp").reset_index(drop=True)
 
-        df["open"] = df["open"].astype(float)
-        df["high"] = df["high"].astype(float)
-        df["low"] = df["low"].astype(float)
-        df["close"] = df["close"].astype(float)
-        df["volume"] = df["volume"].astype(float)
+        # A Binance já devolve as klines em ordem cronológica; só ordena se preciso
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index()
+        return df
 
-        return df.sort_values("timestamp").reset_index(drop=True)
+    def aplicar_kline_stream(
+        self, symbol: str, kline: dict, limit: int = 1000
+    ) -> pd.DataFrame:
+        """
+        Encaixa uma kline recebida pelo WebSocket (campo "k" do evento) na
+        janela do símbolo e devolve a janela atualizada. Sem janela anterior,
+        ou se a kline não continuar a janela, busca a janela inteira via REST.
+        """
+        novo = self._klines_para_dataframe(
+            [[kline["t"], kline["o"], kline["h"], kline["l"], kline["c"], kline["v"]]]
+        )
+        df = self._mesclar_janela(symbol, self.interval, limit, 1, novo)
+        if df is None:
+            klines = self.client.get_klines(
+                symbol=symbol, interval=self.interval, limit=limit
+            )
+            df = self._klines_para_dataframe(klines)
+        return self._salvar_no_cache(
+            self._chave_cache(symbol, self.interval, limit), df
+        )
 
     # Função para obter os dados de preços da Binance
     def get_price_data(
@@ -62,23 +315,4 @@ class DataHandler:
         interval="1m",
         limit=100,
     ):
-        klines = self.client.get_klines(symbol=symbol, interval=interval, limit=limit)
-        df = pd.DataFrame(
-            klines,
-            columns=[
-                "timestamp",
-                "open",
-                "high",
-                "low",
-                "close",
-                "volume",
-                "close_time",
-                "quote_asset_volume",
-                "number_of_trades",
-                "taker_buy_base_asset_volume",
-                "taker_buy_quote_asset_volume",
-                "ignore",
-            ],
-        )
-        df["close"] = df["close"].astype(float)
-        return df
+        return self._obter_klines_df(symbol, interval, limit)
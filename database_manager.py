@@ -1,72 +1,425 @@
+import functools
 import logging
 import sqlite3
-from decimal import Decimal
+import threading
+from contextlib import contextmanager
 
 logger = logging.getLogger(__name__)
 
+# WAL permite leituras concorrentes com a escrita e, com synchronous=NORMAL,
+# o commit deixa de fazer fsync a cada transação. O journal_mode fica gravado
+# no arquivo do banco, por isso só precisa ser aplicado uma vez por processo.
+_PRAGMA_WAL = "PRAGMA journal_mode=WAL"
+
+# Pragmas por conexão: cache de páginas de 64 MB, temporários em memória,
+# leitura via mmap e checkpoint do WAL a cada 1000 páginas
+_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA wal_autocheckpoint=1000",
+)
+
+# Bancos que já foram colocados em WAL neste processo
+_bancos_em_wal = set()
+
+# Versão do schema gravada em PRAGMA user_version. Bancos já na versão atual
+# não executam nenhum DDL ao conectar.
+_SCHEMA_VERSION = 6
+
+# Instruções SQL com texto fixo: o cache de statements do sqlite3 é indexado
+# pelo texto da query, então cada uma é compilada apenas uma vez por conexão
+_SQL_INSERT_TRANSACAO = """
+    INSERT INTO transacoes (data_hora, simbolo, tipo, quantidade, preco, valor_total, taxa, vendido)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_SQL_INSERT_GANHO = """
+    INSERT INTO ganhos (data_hora, simbolo, valor_compras, valor_vendas, taxa_compra, ganhos, porcentagem, taxa_venda)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_SQL_ATUALIZAR_RESUMO = """
+    UPDATE resumo_financeiro
+    SET valor_atual = ?, porcentagem_geral = ?
+    WHERE valor_inicial = ?
+"""
+
+_SQL_MARCAR_COMPRAS_VENDIDAS = """
+    UPDATE transacoes
+    SET vendido = 1
+    WHERE simbolo = ? AND tipo = 'COMPRA'
+"""
+
+_SQL_TRANSACOES = (
+    "SELECT data_hora, simbolo, tipo, quantidade, preco, valor_total, taxa "
+    "FROM transacoes WHERE simbolo = ? AND vendido = 0"
+)
+_SQL_TRANSACOES_POR_TIPO = _SQL_TRANSACOES + " AND tipo = ?"
+
+# Totais das posições em aberto, lidos do agregado mantido pelos triggers de
+# transacoes: uma busca pela chave em vez de varrer as transações do símbolo
+_SQL_TOTAIS = (
+    "SELECT SUM(sum_pv) / SUM(sum_q) as preco_medio, "
+    "SUM(sum_q) as quantidade_total, SUM(sum_taxa) as taxa_total "
+    "FROM agg_posicoes WHERE simbolo = ?"
+)
+_SQL_TOTAIS_POR_TIPO = _SQL_TOTAIS + " AND tipo = ?"
+
+# Recalcula o agregado a partir das transações (migração)
+_SQL_BACKFILL_POSICOES = """
+    INSERT INTO agg_posicoes (simbolo, tipo, sum_pv, sum_q, sum_taxa, n)
+    SELECT simbolo, tipo, COALESCE(SUM(preco * quantidade), 0),
+           COALESCE(SUM(quantidade), 0), COALESCE(SUM(taxa), 0), COUNT(*)
+    FROM transacoes WHERE vendido = 0
+    GROUP BY simbolo, tipo
+"""
+
+# Soma (sinal=+) ou subtrai (sinal=-) uma transação do agregado da posição.
+# Quando a última transação aberta sai, a linha é removida, descartando
+# qualquer resíduo de arredondamento das subtrações.
+_SQL_POSICAO_SOMAR = """
+    INSERT INTO agg_posicoes (simbolo, tipo, sum_pv, sum_q, sum_taxa, n)
+    VALUES ({t}.simbolo, {t}.tipo, COALESCE({t}.preco * {t}.quantidade, 0),
+            COALESCE({t}.quantidade, 0), COALESCE({t}.taxa, 0), 1)
+    ON CONFLICT (simbolo, tipo) DO UPDATE SET
+        sum_pv = sum_pv + excluded.sum_pv,
+        sum_q = sum_q + excluded.sum_q,
+        sum_taxa = sum_taxa + excluded.sum_taxa,
+        n = n + 1;
+"""
+_SQL_POSICAO_SUBTRAIR = """
+    UPDATE agg_posicoes SET
+        sum_pv = sum_pv - COALESCE({t}.preco * {t}.quantidade, 0),
+        sum_q = sum_q - COALESCE({t}.quantidade, 0),
+        sum_taxa = sum_taxa - COALESCE({t}.taxa, 0),
+        n = n - 1
+    WHERE simbolo = {t}.simbolo AND tipo = {t}.tipo;
+    DELETE FROM agg_posicoes
+    WHERE simbolo = {t}.simbolo AND tipo = {t}.tipo AND n <= 0;
+"""
+
+# Triggers que mantêm agg_posicoes em dia com as transações em aberto
+_TRIGGERS_POSICOES = {
+    "trg_posicoes_insert": (
+        "AFTER INSERT ON transacoes WHEN NEW.vendido = 0",
+        _SQL_POSICAO_SOMAR.format(t="NEW"),
+    ),
+    "trg_posicoes_vendido": (
+        "AFTER UPDATE OF vendido ON transacoes "
+        "WHEN OLD.vendido = 0 AND NEW.vendido != 0",
+        _SQL_POSICAO_SUBTRAIR.format(t="OLD"),
+    ),
+    "trg_posicoes_reaberto": (
+        "AFTER UPDATE OF vendido ON transacoes "
+        "WHEN OLD.vendido != 0 AND NEW.vendido = 0",
+        _SQL_POSICAO_SOMAR.format(t="NEW"),
+    ),
+    "trg_posicoes_delete": (
+        "AFTER DELETE ON transacoes WHEN OLD.vendido = 0",
+        _SQL_POSICAO_SUBTRAIR.format(t="OLD"),
+    ),
+}
+
+_SQL_SALVAR_STOP_LOSS = """
+    INSERT OR REPLACE INTO stop_loss (simbolo, stop_loss, preco_maximo)
+    VALUES (?, ?, ?)
+"""
+_SQL_DELETAR_STOP_LOSS = "DELETE FROM stop_loss WHERE simbolo = ?"
+_SQL_OBTER_STOP_LOSS = "SELECT stop_loss, preco_maximo FROM stop_loss WHERE simbolo = ?"
+
+_SQL_VALOR_INICIAL = "SELECT valor_inicial FROM resumo_financeiro"
+_SQL_VALOR_ATUAL = "SELECT valor_atual FROM resumo_financeiro"
+_SQL_VALOR_ATUAL_LUCRO = (
+    "SELECT sum(ganhos) + sum(valor_compras) - sum(valor_vendas) FROM ganhos"
+)
+
+# Agregado acumulado em resumo_financeiro, mantido por registrar_ganhos na
+# mesma transação do INSERT: evita varrer a tabela de ganhos inteira
+_SQL_ACUMULAR_LUCRO = """
+    UPDATE resumo_financeiro
+    SET lucro_acumulado = COALESCE(lucro_acumulado, 0) + ? + ? - ?
+"""
+_SQL_LUCRO_ACUMULADO = "SELECT lucro_acumulado FROM resumo_financeiro LIMIT 1"
+_SQL_BACKFILL_LUCRO = (
+    f"UPDATE resumo_financeiro SET lucro_acumulado = ({_SQL_VALOR_ATUAL_LUCRO})"
+)
+
+# Respostas do LLM por hash do prompt, para não repetir chamadas após reinícios
+_SQL_SALVAR_LLM_CACHE = (
+    "INSERT OR REPLACE INTO llm_cache (chave, valor, ts) VALUES (?, ?, ?)"
+)
+_SQL_OBTER_LLM_CACHE = "SELECT valor FROM llm_cache WHERE chave = ? AND ts >= ?"
+
+
+def _sincronizado(metodo):
+    """
+    Serializa as escritas entre threads; leituras usam a conexão da própria
+    thread e rodam em paralelo graças ao WAL.
+    """
+
+    @functools.wraps(metodo)
+    def wrapper(self, *args, **kwargs):
+        with self._lock_escrita:
+            return metodo(self, *args, **kwargs)
+
+    return wrapper
+
 
 class DatabaseManager:
-    def __init__(self, db_name: str = "trades.db"):
+    def __init__(self, db_name: str = "trades.db", tamanho_lote: int = 50):
         self.db_name = db_name
-        self._conectar()
+        self.tamanho_lote = tamanho_lote
+        self._tx_buf = []
+        self._lock_escrita = threading.RLock()
+        self._profundidade_lote = 0
+        # Uma conexão por thread, todas no mesmo arquivo em modo WAL
+        self._local = threading.local()
+        self._conexoes = []
+        self._geracao = 0
+        self._migrar_schema()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        local = self._local
+        if getattr(local, "geracao", None) != self._geracao:
+            self._conectar()
+        return local.conn
+
+    @property
+    def cursor(self) -> sqlite3.Cursor:
+        local = self._local
+        if getattr(local, "geracao", None) != self._geracao:
+            self._conectar()
+        return local.cursor
 
     def _conectar(self):
-        self.conn = sqlite3.connect(self.db_name)
-        self.cursor = self.conn.cursor()
-        self.criar_tabela_transacoes()
-        self.criar_tabela_ganhos()
-        self.criar_tabela_resumo()
-        self.criar_tabela_stop_loss()
+        """
+        Abre a conexão da thread atual, com os pragmas de desempenho.
+        """
+        # isolation_level=None: sem transações implícitas do módulo sqlite3;
+        # BEGIN/COMMIT são emitidos explicitamente só onde há várias escritas
+        conn = sqlite3.connect(
+            self.db_name,
+            check_same_thread=False,
+            cached_statements=256,
+            isolation_level=None,
+        )
+        if self.db_name not in _bancos_em_wal:
+            conn.execute(_PRAGMA_WAL)
+            _bancos_em_wal.add(self.db_name)
+        for pragma in _PRAGMAS:
+            conn.execute(pragma)
+        conn.row_factory = sqlite3.Row
+
+        cursor = conn.cursor()
+        cursor.arraysize = 1000
+
+        local = self._local
+        local.conn, local.cursor, local.geracao = conn, cursor, self._geracao
+        self._conexoes.append(conn)
+
+    def _migrar_schema(self):
+        """
+        Cria as tabelas e aplica as migrações pendentes, apenas quando a versão
+        gravada no banco for anterior a _SCHEMA_VERSION.
+        """
+        versao = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if versao >= _SCHEMA_VERSION:
+            return
+
+        logger.info(
+            f"Migrando schema do banco de dados da versão {versao} para {_SCHEMA_VERSION}"
+        )
+        # Toda a migração em uma transação: ou aplica tudo, ou nada
+        with self._transacao():
+            self.criar_tabela_transacoes()
+            self.criar_tabela_ganhos()
+            self.criar_tabela_resumo()
+            self.criar_tabela_stop_loss()
+            # v6: cache de respostas do LLM
+            self.criar_tabela_llm_cache()
+
+            # v2: bancos antigos não tinham as colunas de taxa
+            self._adicionar_coluna("transacoes", "taxa", "REAL")
+            self._adicionar_coluna("ganhos", "taxa_venda", "REAL")
+
+            # v3: índices de posições em aberto; ANALYZE para o planner usá-los
+            self.cursor.execute("ANALYZE")
+
+            # v4: lucro acumulado no resumo, preenchido uma vez a partir dos ganhos
+            self._adicionar_coluna("resumo_financeiro", "lucro_acumulado", "REAL")
+            self.cursor.execute(_SQL_BACKFILL_LUCRO)
+
+            # v5: agregado das posições em aberto, preenchido a partir das transações
+            self.cursor.execute("DELETE FROM agg_posicoes")
+            self.cursor.execute(_SQL_BACKFILL_POSICOES)
+
+            self.cursor.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    def _adicionar_coluna(self, tabela: str, coluna: str, tipo: str):
+        colunas = {
+            linha["name"] for linha in self.conn.execute(f"PRAGMA table_info({tabela})")
+        }
+        if coluna not in colunas:
+            self.cursor.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo}")
 
     def criar_tabela_transacoes(self):
-        with self.conn:
-            self.cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS transacoes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    data_hora TEXT,
-                    simbolo TEXT,
-                    tipo TEXT,
-                    quantidade REAL,
-                    preco REAL,
-                    valor_total REAL,
-                    taxa REAL,
-                    vendido INTEGER DEFAULT 0
-                )
+        self.cursor.execute(
             """
+            CREATE TABLE IF NOT EXISTS transacoes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                data_hora TEXT,
+                simbolo TEXT,
+                tipo TEXT,
+                quantidade REAL,
+                preco REAL,
+                valor_total REAL,
+                taxa REAL,
+                vendido INTEGER DEFAULT 0
             )
+        """
+        )
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_tx_sym_tipo ON transacoes(simbolo, tipo)"
+        )
+        # Posições em aberto: filtros por simbolo + vendido (+ tipo)
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_transacoes_simbolo_vendido_tipo "
+            "ON transacoes(simbolo, vendido, tipo)"
+        )
+        self.criar_tabela_posicoes()
 
-    def criar_tabela_ganhos(self):
-        with self.conn:
+    def criar_tabela_posicoes(self):
+        """
+        Agregado por símbolo e tipo das transações em aberto (vendido = 0),
+        atualizado pelos triggers de transacoes.
+        """
+        self.cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS agg_posicoes (
+                simbolo TEXT NOT NULL,
+                tipo TEXT NOT NULL,
+                sum_pv REAL NOT NULL,
+                sum_q REAL NOT NULL,
+                sum_taxa REAL NOT NULL,
+                n INTEGER NOT NULL,
+                PRIMARY KEY (simbolo, tipo)
+            ) WITHOUT ROWID
+        """
+        )
+        for nome, (evento, corpo) in _TRIGGERS_POSICOES.items():
             self.cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS ganhos (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    data_hora TEXT, 
-                    simbolo TEXT, 
-                    valor_compras REAL, 
-                    valor_vendas REAL, 
-                    taxa_compra REAL, 
-                    ganhos REAL, 
-                    porcentagem REAL,
-                    taxa_venda REAL
-                )
+                f"CREATE TRIGGER IF NOT EXISTS {nome} {evento} BEGIN {corpo} END"
+            )
+
+    def criar_tabela_ganhos(self):
+        self.cursor.execute(
             """
+            CREATE TABLE IF NOT EXISTS ganhos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                data_hora TEXT, 
+                simbolo TEXT, 
+                valor_compras REAL, 
+                valor_vendas REAL, 
+                taxa_compra REAL, 
+                ganhos REAL, 
+                porcentagem REAL,
+                taxa_venda REAL
             )
+        """
+        )
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ganhos_simbolo ON ganhos(simbolo)"
+        )
 
     def criar_tabela_resumo(self):
-        with self.conn:
-            self.cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS resumo_financeiro (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    valor_inicial REAL,
-                    valor_atual REAL,
-                    porcentagem_geral REAL
-                )
+        self.cursor.execute(
             """
+            CREATE TABLE IF NOT EXISTS resumo_financeiro (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                valor_inicial REAL,
+                valor_atual REAL,
+                porcentagem_geral REAL,
+                lucro_acumulado REAL
             )
+        """
+        )
+        # O resumo é criado manualmente; ao inserir, já calcula o acumulado
+        self.cursor.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_resumo_lucro_inicial
+            AFTER INSERT ON resumo_financeiro
+            WHEN NEW.lucro_acumulado IS NULL
+            BEGIN
+                UPDATE resumo_financeiro
+                SET lucro_acumulado = ({_SQL_VALOR_ATUAL_LUCRO})
+                WHERE id = NEW.id;
+            END
+            """
+        )
+
+    @contextmanager
+    def batch(self):
+        """
+        Agrupa várias escritas em uma única transação (um único COMMIT).
+        Pode ser aninhado; apenas o lote mais externo faz COMMIT ou ROLLBACK.
+        Enquanto o lote estiver aberto, as outras threads aguardam o lock.
+        """
+        with self._lock_escrita:
+            externo = self._profundidade_lote == 0
+            if externo:
+                # Transações pendentes de antes do lote são gravadas à parte,
+                # para não serem descartadas em caso de ROLLBACK
+                self.flush()
+                self.cursor.execute("BEGIN IMMEDIATE")
+
+            self._profundidade_lote += 1
+            try:
+                yield self
+                if externo:
+                    self.flush()
+            except BaseException:
+                self._profundidade_lote -= 1
+                if externo:
+                    self._tx_buf.clear()
+                    self.cursor.execute("ROLLBACK")
+                raise
+            else:
+                self._profundidade_lote -= 1
+                if externo:
+                    self.cursor.execute("COMMIT")
+
+    @contextmanager
+    def _transacao(self):
+        """
+        Transação explícita para métodos com mais de uma escrita. Dentro de um
+        batch() apenas participa da transação do lote.
+        """
+        if self._profundidade_lote or self.conn.in_transaction:
+            yield
+            return
+
+        self.cursor.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.cursor.execute("ROLLBACK")
+            raise
+        self.cursor.execute("COMMIT")
+
+    @_sincronizado
+    def registrar_transacoes_bulk(self, linhas):
+        """
+        Insere várias transações de uma vez, em uma única transação.
+        Cada linha segue a ordem de _SQL_INSERT_TRANSACAO.
+        """
+        self.flush()
+        with self._transacao():
+            self.cursor.executemany(_SQL_INSERT_TRANSACAO, linhas)
 
+    @_sincronizado
     def registrar_transacao(
         self,
         data_hora: str,
@@ -78,37 +431,47 @@ class DatabaseManager:
         taxa: float,
         vendido,
     ):
+        linha = (data_hora, simbolo, tipo, quantidade, preco, valor_total, taxa, vendido)
+        if self._profundidade_lote:
+            # Dentro de um batch(): gravada com as demais no COMMIT do lote
+            self._tx_buf.append(linha)
+            if len(self._tx_buf) >= self.tamanho_lote:
+                self.flush()
+        else:
+            # Fora de um lote a transação é gravada na hora (autocommit): uma
+            # execução não pode se perder se o processo terminar ou cair
+            self.cursor.execute(_SQL_INSERT_TRANSACAO, linha)
+        logger.info(
+            f"Transação registrada: {tipo} de {quantidade} {simbolo} a {preco} USDT"
+        )
 
-        quantidade = Decimal(str(quantidade))
-        preco = Decimal(str(preco))
-        valor_total = Decimal(str(valor_total))
-        taxa = Decimal(str(taxa))
+    @_sincronizado
+    def flush(self):
+        """
+        Grava em uma única transação as transações pendentes no buffer, que só
+        acumula dentro de um batch().
+        """
+        if not self._tx_buf:
+            return
 
-        with self.conn:
-            self.cursor.execute(
-                """
-                INSERT INTO transacoes (data_hora, simbolo, tipo, quantidade, preco, valor_total, taxa, vendido)
-                VALUES (?, ?, ?, ?, ?, ?,?,?)
-            """,
-                (
-                    data_hora,
-                    simbolo,
-                    tipo,
-                    float(quantidade),
-                    float(preco),
-                    float(valor_total),
-                    float(taxa),
-                    vendido,
-                ),
-            )
-            logger.info(
-                f"Transação registrada: {tipo} de {quantidade} {simbolo} a {preco} USDT"
-            )
+        with self._transacao():
+            self.cursor.executemany(_SQL_INSERT_TRANSACAO, self._tx_buf)
+        self._tx_buf.clear()
 
+    @_sincronizado
     def fechar_conexao(self):
-        self.conn.close()
+        """
+        Grava o buffer e fecha as conexões de todas as threads. Um novo acesso
+        depois disso abre uma conexão nova.
+        """
+        self.flush()
+        for conn in self._conexoes:
+            conn.close()
+        self._conexoes.clear()
+        self._geracao += 1
         logger.info("Conexão com o banco de dados fechada.")
 
+    @_sincronizado
     def registrar_ganhos(
         self,
         data_hora,
@@ -120,110 +483,69 @@ class DatabaseManager:
         porcentagem,
         taxa_venda,
     ):
-
-        valor_compras = Decimal(str(valor_compras))
-        valor_vendas = Decimal(str(valor_vendas))
-        taxa_compra = Decimal(str(taxa_compra))
-        ganhos = Decimal(str(ganhos))
-        porcentagem = Decimal(str(porcentagem))
-        taxa_venda = Decimal(str(taxa_venda))
-
         """
         Registra os ganhos após uma venda.
         """
-        query = """
-        INSERT INTO ganhos (data_hora, simbolo, valor_compras, valor_vendas, taxa_compra, ganhos, porcentagem, taxa_venda)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """
-        self.cursor.execute(
-            query,
-            (
-                data_hora,
-                simbolo,
-                float(valor_compras),
-                float(valor_vendas),
-                float(taxa_compra),
-                float(ganhos),
-                float(porcentagem),
-                float(taxa_venda),
-            ),
-        )
-        self.conn.commit()
+        with self._transacao():
+            self.cursor.execute(
+                _SQL_INSERT_GANHO,
+                (
+                    data_hora,
+                    simbolo,
+                    valor_compras,
+                    valor_vendas,
+                    taxa_compra,
+                    ganhos,
+                    porcentagem,
+                    taxa_venda,
+                ),
+            )
+            self.cursor.execute(
+                _SQL_ACUMULAR_LUCRO, (ganhos, valor_compras, valor_vendas)
+            )
 
+    @_sincronizado
     def atualizar_resumo_financeiro(
         self, valor_inicial, valor_atual, porcentagem_geral
     ):
-
-        valor_atual = Decimal(str(valor_atual))
-        valor_inicial = Decimal(str(valor_inicial))
-        porcentagem_geral = Decimal(str(porcentagem_geral))
-
         """
         Atualiza a tabela com o resumo financeiro geral.
         """
-        query = """
-        UPDATE resumo_financeiro
-        SET valor_atual = ?, porcentagem_geral = ?
-        WHERE valor_inicial = ?
-        """
+        # Escrita única: em modo autocommit não precisa de BEGIN/COMMIT
         self.cursor.execute(
-            query, (float(valor_atual), float(porcentagem_geral), float(valor_inicial))
+            _SQL_ATUALIZAR_RESUMO, (valor_atual, porcentagem_geral, valor_inicial)
         )
-        self.conn.commit()
 
+    @_sincronizado
     def atualizar_compras(self, moeda):
-        query = """
-        UPDATE transacoes
-        SET vendido = 1
-        WHERE simbolo = ? AND tipo = 'COMPRA'
-        """
-        self.cursor.execute(query, (moeda,))
-        self.conn.commit()
+        self.flush()
+        self.cursor.execute(_SQL_MARCAR_COMPRAS_VENDIDAS, (moeda,))
 
     def obter_transacoes(self, simbolo: str, tipo: str = None):
         """
         Obtém todas as transações de um símbolo específico.
         O tipo de transação pode ser "COMPRA" ou "VENDA", se fornecido.
         """
-        query = "SELECT * FROM transacoes WHERE simbolo = ? AND vendido = 0"
-        params = [simbolo]
-
+        self.flush()
         if tipo:
-            query += " AND tipo = ?"
-            params.append(tipo)
-
-        self.cursor.execute(query, params)
-        transacoes = self.cursor.fetchall()
-
-        # Transformar resultado em uma lista de dicionários para facilitar o acesso
-        lista_transacoes = [
-            {
-                "data_hora": transacao[1],
-                "simbolo": transacao[2],
-                "tipo": transacao[3],
-                "quantidade": transacao[4],
-                "preco": transacao[5],
-                "valor_total": transacao[6],
-                "taxa": transacao[7],
-            }
-            for transacao in transacoes
-        ]
-
-        return lista_transacoes
+            self.cursor.execute(_SQL_TRANSACOES_POR_TIPO, (simbolo, tipo))
+        else:
+            self.cursor.execute(_SQL_TRANSACOES, (simbolo,))
+
+        # As linhas são sqlite3.Row, acessíveis por nome (ex: transacao["preco"])
+        return self.cursor.fetchall()
 
     def obter_transacoes_totais(self, simbolo: str, tipo: str = None):
         """
-        Obtém todas as transações de um símbolo específico.
+        Obtém o preço médio, a quantidade total e as taxas das transações em
+        aberto de um símbolo específico.
         O tipo de transação pode ser "COMPRA" ou "VENDA", se fornecido.
         """
-        query = "SELECT SUM(preco * quantidade) / SUM(quantidade) as preco_medio, sum(quantidade) as quantidade_total, sum(taxa) as taxa_total FROM transacoes WHERE simbolo = ? AND vendido = 0"
-        params = [simbolo]
-
+        self.flush()
         if tipo:
-            query += " AND tipo = ?"
-            params.append(tipo)
-
-        self.cursor.execute(query, params)
+            self.cursor.execute(_SQL_TOTAIS_POR_TIPO, (simbolo, tipo))
+        else:
+            self.cursor.execute(_SQL_TOTAIS, (simbolo,))
         transacoes = self.cursor.fetchone()
 
         if transacoes:
@@ -232,69 +554,89 @@ class DatabaseManager:
         return 0.0, 0.0, 0.0
 
     def criar_tabela_stop_loss(self):
-        with self.conn:
-            self.cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS stop_loss (
-                    simbolo TEXT PRIMARY KEY,
-                    stop_loss REAL,
-                    preco_maximo REAL
-                )
-                """
+        self.cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS stop_loss (
+                simbolo TEXT PRIMARY KEY,
+                stop_loss REAL,
+                preco_maximo REAL
             )
+            """
+        )
 
-    def salvar_stop_loss(self, simbolo: str, stop_loss: float, preco_maximo: float):
+    def criar_tabela_llm_cache(self):
+        self.cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                chave TEXT PRIMARY KEY,
+                valor TEXT,
+                ts INTEGER
+            ) WITHOUT ROWID
+            """
+        )
 
-        stop_loss = Decimal(str(stop_loss))
-        preco_maximo = Decimal(str(preco_maximo))
+    @_sincronizado
+    def salvar_llm_cache(self, chave: str, valor: str, ts: int):
+        self.cursor.execute(_SQL_SALVAR_LLM_CACHE, (chave, valor, ts))
 
-        with self.conn:
-            self.cursor.execute(
-                """
-                INSERT OR REPLACE INTO stop_loss (simbolo, stop_loss, preco_maximo)
-                VALUES (?, ?, ?)
-                """,
-                (simbolo, float(stop_loss), float(preco_maximo)),
-            )
+    def obter_llm_cache(self, chave: str, ts_minimo: int):
+        """
+        Retorna a resposta em cache para a chave, se gravada a partir de
+        ts_minimo (epoch em segundos).
+        """
+        self.cursor.execute(_SQL_OBTER_LLM_CACHE, (chave, ts_minimo))
+        resultado = self.cursor.fetchone()
+        if resultado:
+            return resultado[0]
+        return None
+
+    @_sincronizado
+    def salvar_stop_loss(self, simbolo: str, stop_loss: float, preco_maximo: float):
+        self.cursor.execute(_SQL_SALVAR_STOP_LOSS, (simbolo, stop_loss, preco_maximo))
 
+    @_sincronizado
     def deleta_stop_loss(self, simbolo: str):
-        with self.conn:
-            self.cursor.execute(
-                """
-                DELETE FROM stop_loss WHERE simbolo = ?
-                """,
-                (simbolo,),
-            )
+        self.cursor.execute(_SQL_DELETAR_STOP_LOSS, (simbolo,))
 
     def obter_stop_loss(self, simbolo: str):
-        self.cursor.execute(
-            "SELECT stop_loss, preco_maximo FROM stop_loss WHERE simbolo = ?",
-            (simbolo,),
-        )
+        self.cursor.execute(_SQL_OBTER_STOP_LOSS, (simbolo,))
         resultado = self.cursor.fetchone()
         if resultado:
             return resultado[0], resultado[1]
         return None, None
 
     def obter_valor_inicial(self):
-        self.cursor.execute("SELECT valor_inicial FROM resumo_financeiro")
+        self.cursor.execute(_SQL_VALOR_INICIAL)
         resultado = self.cursor.fetchone()
         if resultado:
             return resultado[0]
         return None
 
     def obter_valor_atual(self):
-        self.cursor.execute("SELECT valor_atual FROM resumo_financeiro")
+        self.cursor.execute(_SQL_VALOR_ATUAL)
         resultado = self.cursor.fetchone()
         if resultado:
             return resultado[0]
         return None
 
     def obter_valor_atual_lucro(self):
-        self.cursor.execute(
-            "SELECT sum(ganhos) + sum(valor_compras) - sum(valor_vendas) FROM ganhos"
-        )
+        self.cursor.execute(_SQL_LUCRO_ACUMULADO)
+        resultado = self.cursor.fetchone()
+        if resultado and resultado[0] is not None:
+            return resultado[0]
+
+        # Sem resumo (ou sem ganhos ainda): agrega direto da tabela de ganhos
+        self.cursor.execute(_SQL_VALOR_ATUAL_LUCRO)
         resultado = self.cursor.fetchone()
         if resultado:
             return resultado[0]
         return None
+
+
+@functools.lru_cache(maxsize=None)
+def obter_database_manager(db_name: str = "trades.db") -> DatabaseManager:
+    """
+    Retorna o DatabaseManager compartilhado do processo para o banco informado,
+    evitando várias conexões disputando o lock de escrita do WAL.
+    """
+    return DatabaseManager(db_name)
@@ -0,0 +1,211 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional
+
+from binance.client import Client
+
+from http_session import ler_json
+
+logger = logging.getLogger(__name__)
+
+EXCHANGE_INFO_CACHE_FILE = "exchange_info.json"
+EXCHANGE_INFO_TTL = 6 * 60 * 60  # 6 horas; os filtros mudam raramente
+EXCHANGE_INFO_BUCKET = 5 * 60  # reaproveita em memória por 5 minutos
+
+# Erros da Binance que indicam filtros desatualizados: "Filter failure" e
+# "Invalid symbol"
+CODIGOS_FILTRO_DESATUALIZADO = (-1013, -1121)
+
+# Um único download por vez: as threads que chegam durante o download esperam
+# e reaproveitam o arquivo gravado, em vez de baixar (peso 20) cada uma
+_lock_download = threading.Lock()
+
+# Um exchange info baixado há menos que isso não é descartado de novo: várias
+# ordens recusadas na mesma rodada geram um único download
+EXCHANGE_INFO_IDADE_MINIMA = 60
+
+
+def obter_exchange_info(
+    client: Client,
+    cache_file: str = EXCHANGE_INFO_CACHE_FILE,
+    ttl: float = EXCHANGE_INFO_TTL,
+) -> dict:
+    """
+    Retorna o exchange info da Binance, usando uma cópia em disco enquanto ela
+    tiver menos de ttl segundos. Dentro de uma janela de 5 minutos o resultado
+    é reaproveitado em memória, sem nem consultar o arquivo.
+    """
+    bucket = int(time.time() // EXCHANGE_INFO_BUCKET)
+    return _exchange_info_em_memoria(client, cache_file, ttl, bucket)
+
+
+@lru_cache(maxsize=4)
+def _exchange_info_em_memoria(
+    client: Client, cache_file: str, ttl: float, bucket: int
+) -> dict:
+    em_disco = _ler_cache_valido(cache_file, ttl)
+    if em_disco is not None:
+        return em_disco
+
+    with _lock_download:
+        # Outra thread pode ter baixado enquanto esta esperava o lock
+        em_disco = _ler_cache_valido(cache_file, ttl)
+        if em_disco is not None:
+            return em_disco
+
+        logger.info("Baixando exchange info da Binance...")
+        exchange_info = client.get_exchange_info()
+
+        # Grava em um temporário exclusivo no mesmo diretório e renomeia, para
+        # nunca deixar o cache pela metade
+        fd, tmp_file = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(cache_file)), suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(exchange_info, f)
+            os.replace(tmp_file, cache_file)
+        except BaseException:
+            os.remove(tmp_file)
+            raise
+
+    return exchange_info
+
+
+def _ler_cache_valido(cache_file: str, ttl: float) -> Optional[dict]:
+    # O arquivo pode sumir a qualquer momento (invalidar_exchange_info)
+    try:
+        mtime = os.path.getmtime(cache_file)
+        if time.time() - mtime < ttl:
+            return _carregar_cache(cache_file, mtime)
+    except FileNotFoundError:
+        pass
+    return None
+
+
+def invalidar_exchange_info(cache_file: str = EXCHANGE_INFO_CACHE_FILE) -> None:
+    """
+    Descarta o exchange info em disco e os índices em memória, para que a
+    próxima consulta baixe os filtros novamente da Binance.
+    """
+    # Com o lock, nunca remove o arquivo no meio de um download
+    with _lock_download:
+        try:
+            if time.time() - os.path.getmtime(cache_file) < EXCHANGE_INFO_IDADE_MINIMA:
+                return
+            os.remove(cache_file)
+        except FileNotFoundError:
+            pass
+        logger.warning(
+            "Filtros possivelmente desatualizados; descartando o exchange info."
+        )
+        for cache in (
+            _exchange_info_em_memoria,
+            _carregar_cache,
+            _indice_em_memoria,
+            _filtros_em_memoria,
+        ):
+            cache.cache_clear()
+
+
+@lru_cache(maxsize=4)
+def _carregar_cache(cache_file: str, mtime: float) -> dict:
+    # mtime faz parte da chave: o arquivo só é relido quando for regravado
+    with open(cache_file, "rb") as f:
+        return ler_json(f.read())
+
+
+def indexar_simbolos(exchange_info: dict) -> Dict[str, dict]:
+    """
+    Indexa as informações de cada símbolo pelo nome do símbolo.
+    """
+    return {s["symbol"]: s for s in exchange_info["symbols"]}
+
+
+def obter_indice_simbolos(
+    client: Client,
+    cache_file: str = EXCHANGE_INFO_CACHE_FILE,
+    ttl: float = EXCHANGE_INFO_TTL,
+) -> Dict[str, dict]:
+    """
+    Atalho para obter o exchange info (com cache) já indexado por símbolo.
+    O índice é reaproveitado na mesma janela de 5 minutos do exchange info.
+    """
+    bucket = int(time.time() // EXCHANGE_INFO_BUCKET)
+    return _indice_em_memoria(client, cache_file, ttl, bucket)
+
+
+@lru_cache(maxsize=4)
+def _indice_em_memoria(
+    client: Client, cache_file: str, ttl: float, bucket: int
+) -> Dict[str, dict]:
+    exchange_info = _exchange_info_em_memoria(client, cache_file, ttl, bucket)
+    return indexar_simbolos(exchange_info)
+
+
+class LotSize(NamedTuple):
+    min_qty: float
+    max_qty: float
+    step_size: float
+    # Casas decimais do step, calculadas uma vez ao ler os filtros
+    casas: int
+
+
+class FiltrosSimbolo(NamedTuple):
+    lot_size: Optional[LotSize]
+    min_notional: Optional[float]
+    # Mantido como texto, para ser convertido em Decimal sem perda
+    tick_size: Optional[str]
+
+
+def _extrair_filtros(filtros: list) -> FiltrosSimbolo:
+    por_tipo = {f["filterType"]: f for f in filtros}
+
+    lot = por_tipo.get("LOT_SIZE")
+    notional = por_tipo.get("NOTIONAL") or por_tipo.get("MIN_NOTIONAL")
+    preco = por_tipo.get("PRICE_FILTER")
+    return FiltrosSimbolo(
+        lot_size=(
+            LotSize(
+                float(lot["minQty"]),
+                float(lot["maxQty"]),
+                float(lot["stepSize"]),
+                max(0, -Decimal(lot["stepSize"]).normalize().as_tuple().exponent),
+            )
+            if lot
+            else None
+        ),
+        min_notional=float(notional["minNotional"]) if notional else None,
+        tick_size=preco["tickSize"] if preco else None,
+    )
+
+
+def obter_filtros_simbolos(
+    client: Client,
+    cache_file: str = EXCHANGE_INFO_CACHE_FILE,
+    ttl: float = EXCHANGE_INFO_TTL,
+) -> Dict[str, FiltrosSimbolo]:
+    """
+    Retorna, por símbolo, o filtro LOT_SIZE já convertido (min_qty, max_qty,
+    step_size), o notional mínimo e o tickSize do PRICE_FILTER; None quando o
+    símbolo não tem o filtro.
+    Montado uma vez por janela de 5 minutos, junto com o exchange info.
+    """
+    bucket = int(time.time() // EXCHANGE_INFO_BUCKET)
+    return _filtros_em_memoria(client, cache_file, ttl, bucket)
+
+
+@lru_cache(maxsize=4)
+def _filtros_em_memoria(
+    client: Client, cache_file: str, ttl: float, bucket: int
+) -> Dict[str, FiltrosSimbolo]:
+    exchange_info = _exchange_info_em_memoria(client, cache_file, ttl, bucket)
+    return {
+        s["symbol"]: _extrair_filtros(s["filters"]) for s in exchange_info["symbols"]
+    }
@@ -0,0 +1,74 @@
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterable
+
+from binance.client import Client
+
+from binance_client import get_client
+from config import NOTIONAL_MINIMO_FILE, BotConfig
+from exchange_info import obter_indice_simbolos
+
+logger = logging.getLogger(__name__)
+
+# A Binance usa NOTIONAL nos símbolos atuais e MIN_NOTIONAL nos antigos
+_FILTROS_NOTIONAL = ("NOTIONAL", "MIN_NOTIONAL")
+
+NOTIONAL_MINIMO_TTL = 24 * 60 * 60  # 24 horas
+
+
+def obter_notional_minimo_para_moedas(
+    client: Client,
+    moedas: Iterable[str],
+    cache_file: str = NOTIONAL_MINIMO_FILE,
+    ttl: float = NOTIONAL_MINIMO_TTL,
+) -> Dict[str, float]:
+    """
+    Retorna o valor notional mínimo (em USDT) de uma ordem para cada moeda.
+    O resultado fica salvo em cache_file e é reaproveitado enquanto tiver
+    menos de ttl segundos e cobrir todas as moedas pedidas.
+    """
+    moedas = frozenset(moeda.strip() for moeda in moedas)
+
+    if os.path.exists(cache_file) and time.time() - os.path.getmtime(cache_file) < ttl:
+        with open(cache_file, "r") as f:
+            cache = json.load(f)
+        if moedas <= cache.keys():
+            return {moeda: cache[moeda] for moeda in moedas}
+
+    indice = obter_indice_simbolos(client)
+    notional_minimo = {}
+
+    for moeda in moedas:
+        info = indice.get(moeda)
+        if info is None:
+            logger.warning(f"Símbolo {moeda} não encontrado no exchange info.")
+            continue
+
+        for f in info["filters"]:
+            if f["filterType"] in _FILTROS_NOTIONAL:
+                notional_minimo[moeda] = float(f["minNotional"])
+                break
+
+    # Grava em arquivo temporário e renomeia, para nunca deixar o cache pela metade
+    tmp_file = f"{cache_file}.tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(notional_minimo, f)
+    os.replace(tmp_file, cache_file)
+
+    return notional_minimo
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    config = BotConfig.load()
+
+    client = get_client(
+        config.binance_api_key, config.binance_secret_key, manter_conexao=False
+    )
+
+    notional_minimo = obter_notional_minimo_para_moedas(client, config.simbolos)
+
+    # Linha pronta para ser copiada para o .env
+    print(f"MIN_NOTIONAL = {json.dumps(notional_minimo)}")
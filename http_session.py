@@ -0,0 +1,56 @@
+import json
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    from orjson import loads as ler_json
+except ImportError:  # orjson é opcional; sem ele usa o json da biblioteca padrão
+    ler_json = json.loads
+
+POOL_CONEXOES = 32
+
+# Tempo máximo para conectar e para ler a resposta, em segundos
+TIMEOUT_PADRAO = (3, 20)
+
+
+class _Retentativa(Retry):
+    """
+    Retry que também repete POST, mas só quando é seguro: no 429, que garante
+    que a requisição foi recusada sem ser processada. Falhas de conexão já são
+    repetidas pelo urllib3 em qualquer método. Um POST com 5xx ou timeout de
+    leitura pode ter sido entregue, e repeti-lo duplicaria a mensagem.
+    """
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method.upper() == "POST":
+            return bool(self.total) and status_code == 429
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+def criar_sessao(
+    tentativas: int = 3,
+    backoff_factor: float = 0.3,
+    conexoes: int = POOL_CONEXOES,
+) -> requests.Session:
+    """
+    Cria uma requests.Session com pool de conexões keep-alive (sem novo
+    handshake TLS a cada chamada) e retentativas com backoff exponencial em
+    falhas de conexão e respostas 429/5xx, respeitando o Retry-After. POST só é
+    repetido em falha de conexão e no 429.
+    """
+    retry = _Retentativa(
+        total=tentativas,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=frozenset({"GET"}),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=conexoes, pool_maxsize=conexoes, max_retries=retry
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    return session
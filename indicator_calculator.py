@@ -1,57 +1,430 @@
+import math
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Union
+
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
+
+from indicator_kernels import (
+    aquecer_kernels,
+    bandas_bollinger,
+    ema,
+    momentum,
+    rsi_wilder,
+    sma,
+)
+
+_NS_POR_DIA = 86_400_000_000_000
+
+
+@dataclass(frozen=True, slots=True)
+class OHLCV:
+    """
+    Janela de velas em arrays contíguos float64, um por campo, prontos para os
+    kernels numéricos. ts são os timestamps em nanosegundos (UTC).
+    """
+
+    ts: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    @classmethod
+    def de_dataframe(cls, df: pd.DataFrame) -> "OHLCV":
+        """
+        Extrai os arrays de um DataFrame indexado por timestamp (ou com a
+        coluna timestamp). Feito uma única vez, na entrada do cálculo.
+        """
+        if isinstance(df.index, pd.DatetimeIndex):
+            ts = df.index.asi8
+        else:
+            ts = df["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        return cls(
+            ts=ts,
+            open=df["open"].to_numpy(dtype=np.float64),
+            high=df["high"].to_numpy(dtype=np.float64),
+            low=df["low"].to_numpy(dtype=np.float64),
+            close=df["close"].to_numpy(dtype=np.float64),
+            volume=df["volume"].to_numpy(dtype=np.float64),
+        )
+
+    def __len__(self) -> int:
+        return self.close.shape[0]
+
+    def para_dataframe(self, colunas: dict = None) -> pd.DataFrame:
+        """
+        Monta o DataFrame indexado por timestamp, com as colunas extras
+        informadas. Usado só onde um DataFrame é de fato necessário.
+        """
+        dados = {
+            "open": self.open,
+            "high": self.high,
+            "low": self.low,
+            "close": self.close,
+            "volume": self.volume,
+        }
+        if colunas:
+            dados.update(colunas)
+        indice = pd.DatetimeIndex(self.ts.view("datetime64[ns]"), name="timestamp")
+        return pd.DataFrame(dados, index=indice, copy=False)
+
+
+def _vwap_diario(
+    ts: np.ndarray,
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    volume: np.ndarray,
+) -> np.ndarray:
+    """
+    VWAP ancorado no dia (como ta.vwap): somas acumuladas de preço típico x
+    volume e de volume, reiniciadas à meia-noite UTC.
+    """
+    pv = (high + low + close) / 3.0 * volume
+    soma_pv = np.cumsum(pv)
+    soma_v = np.cumsum(volume)
+
+    # Posição da primeira vela do dia de cada linha
+    dia = ts // _NS_POR_DIA
+    novo_dia = np.empty(ts.shape[0], dtype=bool)
+    novo_dia[:1] = True
+    novo_dia[1:] = dia[1:] != dia[:-1]
+    inicio_dia = np.maximum.accumulate(np.where(novo_dia, np.arange(ts.shape[0]), 0))
+
+    # Desconta o acumulado dos dias anteriores
+    soma_pv -= (soma_pv - pv)[inicio_dia]
+    soma_v -= (soma_v - volume)[inicio_dia]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return soma_pv / soma_v
+
+
+# Passos do cálculo completo. Cada um recebe o calculador e a janela OHLCV e
+# devolve as colunas que produz.
+def _passo_rsi(calc, d: OHLCV):
+    return {"RSI": rsi_wilder(d.close, calc.rsi_length)}
+
+
+def _passo_sma50(calc, d: OHLCV):
+    return {"SMA50": sma(d.close, 50)}
+
+
+def _passo_sma200(calc, d: OHLCV):
+    return {"SMA200": sma(d.close, 200)}
+
+
+def _passo_vwap(calc, d: OHLCV):
+    return {"VWAP": _vwap_diario(d.ts, d.high, d.low, d.close, d.volume)}
+
+
+def _passo_bollinger(calc, d: OHLCV):
+    # Bandas de Bollinger (20 períodos, 2 desvios padrão populacionais)
+    superior, inferior = bandas_bollinger(d.close, 20, 2.0)
+    return {"BB_upper": superior, "BB_lower": inferior}
+
+
+def _passo_momentum(calc, d: OHLCV):
+    return {"Momentum": momentum(d.close, calc.momentum_length)}
+
+
+def _passo_volume(calc, d: OHLCV):
+    # Média do volume
+    return {"Volume": sma(d.volume, 10)}
+
+
+def _passo_emas(calc, d: OHLCV):
+    return {"EMA1": ema(d.close, 9), "EMA2": ema(d.close, 21)}
+
+
+_PASSOS = {
+    "RSI": _passo_rsi,
+    "SMA50": _passo_sma50,
+    "SMA200": _passo_sma200,
+    "VWAP": _passo_vwap,
+    "BollingerBands": _passo_bollinger,
+    "Momentum": _passo_momentum,
+    "Volume": _passo_volume,
+}
+
+INDICADORES_PADRAO = frozenset(_PASSOS)
+
+
+@lru_cache(maxsize=None)
+def _montar_plano(habilitados: frozenset) -> tuple:
+    """
+    Lista fixa de passos para um conjunto de indicadores, montada uma única
+    vez e compartilhada entre todos os símbolos com a mesma configuração.
+    As EMAs são sempre calculadas.
+    """
+    return tuple(
+        passo for nome, passo in _PASSOS.items() if nome in habilitados
+    ) + (_passo_emas,)
 
 
 class IndicatorCalculator:
-    def __init__(self, rsi_length: int = 7, momentum_length: int = 10):
+    def __init__(
+        self,
+        rsi_length: int = 7,
+        momentum_length: int = 10,
+        indicadores: dict = None,
+    ):
         self.rsi_length = rsi_length
         self.momentum_length = momentum_length
+        self._plano = self._plano_para(indicadores)
+        aquecer_kernels()
+
+    @staticmethod
+    def _plano_para(indicadores: dict = None) -> tuple:
+        if indicadores is None:
+            return _montar_plano(INDICADORES_PADRAO)
+        return _montar_plano(
+            frozenset(nome for nome, ativo in indicadores.items() if ativo)
+        )
+
+    def calcular_colunas(self, dados: OHLCV, indicadores: dict = None) -> dict:
+        """
+        Calcula os indicadores direto sobre os arrays e devolve um dicionário
+        coluna -> array, sem passar por DataFrame.
+        """
+        # O plano é resolvido na criação; só muda se um conjunto for informado
+        plano = self._plano if indicadores is None else self._plano_para(indicadores)
+        colunas = {}
+        for passo in plano:
+            colunas.update(passo(self, dados))
+        return colunas
 
     def calcular_indicadores(
-        self, df: pd.DataFrame, indicadores: dict = None
+        self, df: Union[pd.DataFrame, OHLCV], indicadores: dict = None
     ) -> pd.DataFrame:
-        if indicadores is None:
-            indicadores = {
-                "RSI": True,
-                "SMA50": True,
-                "SMA200": True,
-                "VWAP": True,
-                "BollingerBands": True,
-                "Momentum": True,
-                "Volume": True,
-                "EM1": True,
-                "EMA2": True,
-            }
-
-        # Certifique-se de que o índice é um DatetimeIndex
-        if not isinstance(df.index, pd.DatetimeIndex):
-            df = df.set_index("timestamp")
-
-        if indicadores.get("RSI"):
-            df["RSI"] = ta.rsi(df["close"], length=self.rsi_length)
-        if indicadores.get("SMA50"):
-            df["SMA50"] = ta.sma(df["close"], length=50)
-        if indicadores.get("SMA200"):
-            df["SMA200"] = ta.sma(df["close"], length=200)
-        if indicadores.get("VWAP"):
-            # Cálculo do VWAP utilizando o pandas_ta
-            df["VWAP"] = ta.vwap(df["high"], df["low"], df["close"], df["volume"])
-
-        if indicadores.get("BollingerBands"):
-            # Cálculo das Bandas de Bollinger
-            bbands = ta.bbands(df["close"], length=20, std=2)
-            df["BB_upper"] = bbands["BBU_20_2.0"]
-            df["BB_lower"] = bbands["BBL_20_2.0"]
-
-        if indicadores.get("Momentum"):
-            df["Momentum"] = ta.mom(df["close"], length=self.momentum_length)
-
-        if indicadores.get("Volume"):
-            df["Volume"] = df["volume"].rolling(window=10).mean()  # Média do volume
-
-        # Cálculo das EMAs
-        df["EMA1"] = ta.ema(df["close"], length=9)
-        df["EMA2"] = ta.ema(df["close"], length=21)
-        df["CLOSE_PRICE"] = df["close"][-1]
+        # DataFrames são convertidos uma única vez na entrada; daí em diante
+        # todos os indicadores leem os mesmos arrays contíguos
+        if isinstance(df, OHLCV):
+            dados = df
+            df = dados.para_dataframe(self.calcular_colunas(dados, indicadores))
+        else:
+            # O DataHandler já entrega o DataFrame indexado por timestamp; sem
+            # índice, a coluna timestamp é lida direto, sem copiar o DataFrame
+            dados = OHLCV.de_dataframe(df)
+            df = df.assign(**self.calcular_colunas(dados, indicadores))
 
+        # Último fechamento como metadado escalar, sem ocupar uma coluna inteira
+        df.attrs["close_price"] = float(dados.close[-1])
         return df
+
+
+# Colunas mantidas pelo cálculo incremental, na ordem do histórico interno
+COLUNAS_INCREMENTAIS = (
+    "RSI",
+    "SMA50",
+    "SMA200",
+    "VWAP",
+    "BB_upper",
+    "BB_lower",
+    "Momentum",
+    "Volume",
+    "EMA1",
+    "EMA2",
+)
+
+
+class IncrementalIndicators:
+    """
+    Mantém o estado dos indicadores de um símbolo e o atualiza em O(1) a cada
+    vela fechada, em vez de recalcular a janela inteira a cada execução.
+    A última linha do DataFrame (vela ainda aberta) é calculada sem alterar o
+    estado. Sem estado, ou se houver um buraco entre o estado e os dados, a
+    janela recebida é reprocessada do início (mesmo resultado do cálculo
+    completo de IndicatorCalculator).
+    """
+
+    def __init__(
+        self, rsi_length: int = 7, momentum_length: int = 10, max_historico: int = 1000
+    ):
+        self.rsi_length = rsi_length
+        self.momentum_length = momentum_length
+        self.max_historico = max_historico
+        self.resetar()
+
+    def resetar(self) -> None:
+        self._ultimo_ts = None
+        self._closes = deque(maxlen=max(200, self.momentum_length))
+        self._somas = {20: 0.0, 50: 0.0, 200: 0.0}
+        self._volumes = deque(maxlen=10)
+        self._soma_volume = 0.0
+        self._emas = {9: math.nan, 21: math.nan}
+        # Numeradores/denominadores das RMAs de Wilder (ewm com adjust=True)
+        self._ganho_num = self._ganho_den = 0.0
+        self._perda_num = self._perda_den = 0.0
+        self._rma_obs = 0
+        self._dia = None
+        self._vwap_pv = self._vwap_v = 0.0
+        # Buffer com o dobro do tamanho: compacta só quando enche (O(1) amortizado)
+        self._historico = np.empty((2 * self.max_historico, len(COLUNAS_INCREMENTAIS)))
+        self._pos = 0
+
+    def aplicar(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Atualiza o estado com as velas fechadas ainda não vistas e devolve o
+        DataFrame com as colunas de indicadores preenchidas.
+        """
+        n = len(df)
+        if n == 0:
+            return df
+
+        dados = OHLCV.de_dataframe(df)
+        ts, high, low, close, volume = (
+            dados.ts,
+            dados.high,
+            dados.low,
+            dados.close,
+            dados.volume,
+        )
+
+        # A última vela ainda está aberta: todas as anteriores estão fechadas
+        fechadas = n - 1
+        inicio = 0
+        if self._ultimo_ts is not None:
+            inicio = int(np.searchsorted(ts[:fechadas], self._ultimo_ts, side="right"))
+            if inicio == 0 or ts[inicio - 1] != self._ultimo_ts:
+                # Os dados não continuam de onde o estado parou
+                inicio = 0
+        if inicio == 0:
+            self.resetar()
+
+        for i in range(inicio, fechadas):
+            self._passo(ts[i], high[i], low[i], close[i], volume[i], confirmar=True)
+
+        ultima = self._passo(ts[-1], high[-1], low[-1], close[-1], volume[-1])
+
+        valores = np.full((n, len(COLUNAS_INCREMENTAIS)), np.nan)
+        disponiveis = min(self._pos, fechadas)
+        valores[fechadas - disponiveis : fechadas] = self._historico[
+            self._pos - disponiveis : self._pos
+        ]
+        valores[-1] = ultima
+
+        df = df.assign(**dict(zip(COLUNAS_INCREMENTAIS, valores.T)))
+        df.attrs["close_price"] = float(close[-1])
+        return df
+
+    def _passo(
+        self,
+        ts: int,
+        high: float,
+        low: float,
+        close: float,
+        volume: float,
+        confirmar: bool = False,
+    ) -> tuple:
+        """
+        Calcula os indicadores de uma vela a partir do estado atual. Com
+        confirmar=True a vela passa a fazer parte do estado.
+        """
+        closes = self._closes
+        k = len(closes)
+
+        # Médias simples: soma da janela trocando o valor que sai pelo que entra
+        somas = {}
+        medias = {}
+        for janela, soma in self._somas.items():
+            nova = soma + close - (closes[-janela] if k >= janela else 0.0)
+            somas[janela] = nova
+            medias[janela] = nova / janela if k + 1 >= janela else math.nan
+
+        # Bandas de Bollinger: desvio padrão populacional dos últimos 20
+        if k + 1 >= 20:
+            media = medias[20]
+            quadrados = (close - media) ** 2
+            for i in range(1, 20):
+                quadrados += (closes[-i] - media) ** 2
+            desvio = math.sqrt(quadrados / 20)
+        else:
+            desvio = math.nan
+
+        m = self.momentum_length
+        momentum_atual = close - closes[-m] if k >= m else math.nan
+
+        vols = self._volumes
+        soma_volume = (
+            self._soma_volume + volume - (vols[0] if len(vols) == vols.maxlen else 0.0)
+        )
+        volume_medio = soma_volume / 10 if len(vols) + 1 >= 10 else math.nan
+
+        # RSI com as RMAs de Wilder dos ganhos e perdas
+        ganho_num, ganho_den = self._ganho_num, self._ganho_den
+        perda_num, perda_den, rma_obs = self._perda_num, self._perda_den, self._rma_obs
+        if k > 0:
+            delta = close - closes[-1]
+            decaimento = 1.0 - 1.0 / self.rsi_length
+            ganho_num = max(delta, 0.0) + decaimento * ganho_num
+            ganho_den = 1.0 + decaimento * ganho_den
+            perda_num = max(-delta, 0.0) + decaimento * perda_num
+            perda_den = 1.0 + decaimento * perda_den
+            rma_obs += 1
+        rsi = math.nan
+        if rma_obs >= self.rsi_length:
+            media_ganhos = ganho_num / ganho_den
+            media_perdas = perda_num / perda_den
+            total = media_ganhos + media_perdas
+            if total:
+                rsi = 100.0 * media_ganhos / total
+
+        # EMAs semeadas com a SMA dos primeiros valores
+        emas = {}
+        for janela, anterior in self._emas.items():
+            if k + 1 < janela:
+                emas[janela] = math.nan
+            elif k + 1 == janela:
+                emas[janela] = (sum(closes) + close) / janela
+            else:
+                alpha = 2.0 / (janela + 1.0)
+                emas[janela] = alpha * close + (1.0 - alpha) * anterior
+
+        # VWAP ancorado no dia (reinicia à meia-noite UTC)
+        dia = ts // _NS_POR_DIA
+        vwap_pv, vwap_v = (
+            (self._vwap_pv, self._vwap_v) if dia == self._dia else (0.0, 0.0)
+        )
+        vwap_pv += (high + low + close) / 3.0 * volume
+        vwap_v += volume
+        vwap = vwap_pv / vwap_v if vwap_v else math.nan
+
+        linha = (
+            rsi,
+            medias[50],
+            medias[200],
+            vwap,
+            medias[20] + 2.0 * desvio,
+            medias[20] - 2.0 * desvio,
+            momentum_atual,
+            volume_medio,
+            emas[9],
+            emas[21],
+        )
+
+        if confirmar:
+            closes.append(close)
+            vols.append(volume)
+            self._somas = somas
+            self._soma_volume = soma_volume
+            self._emas = emas
+            self._ganho_num, self._ganho_den = ganho_num, ganho_den
+            self._perda_num, self._perda_den = perda_num, perda_den
+            self._rma_obs = rma_obs
+            self._dia, self._vwap_pv, self._vwap_v = dia, vwap_pv, vwap_v
+            self._ultimo_ts = ts
+            self._guardar(linha)
+
+        return linha
+
+    def _guardar(self, linha: tuple) -> None:
+        if self._pos == self._historico.shape[0]:
+            self._historico[: self.max_historico] = self._historico[
+                self._pos - self.max_historico : self._pos
+            ]
+            self._pos = self.max_historico
+        self._historico[self._pos] = linha
+        self._pos += 1
@@ -0,0 +1,178 @@
+import math
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba é opcional; sem ele os kernels rodam em Python puro
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def decorador(func):
+            return func
+
+        return decorador
+
+
+@njit(cache=True)
+def desvio_padrao_welford(x: np.ndarray, n: int) -> float:
+    """
+    Desvio padrão populacional dos últimos n valores de x, em uma única
+    passada (algoritmo de Welford), numericamente estável para preços altos.
+    """
+    total = x.shape[0]
+    if n > total:
+        n = total
+    if n <= 0:
+        return math.nan
+
+    inicio = total - n
+    media = 0.0
+    m2 = 0.0
+    for i in range(n):
+        valor = x[inicio + i]
+        delta = valor - media
+        media += delta / (i + 1)
+        m2 += delta * (valor - media)
+    return math.sqrt(m2 / n)
+
+
+@njit(cache=True)
+def rma_wilder(x: np.ndarray, length: int) -> np.ndarray:
+    """
+    Média móvel de Wilder (ewm com alpha=1/length e adjust=True, como ta.rma).
+    Valores NaN são ignorados; a saída é NaN até acumular length observações.
+    """
+    n = x.shape[0]
+    out = np.empty(n)
+    decaimento = 1.0 - 1.0 / length
+    numerador = 0.0
+    denominador = 0.0
+    observacoes = 0
+    for i in range(n):
+        valor = x[i]
+        if not math.isnan(valor):
+            numerador = valor + decaimento * numerador
+            denominador = 1.0 + decaimento * denominador
+            observacoes += 1
+        elif observacoes > 0:
+            numerador *= decaimento
+            denominador *= decaimento
+        out[i] = numerador / denominador if observacoes >= length else math.nan
+    return out
+
+
+@njit(cache=True)
+def rsi_wilder(close: np.ndarray, length: int) -> np.ndarray:
+    """
+    RSI com suavização de Wilder em uma única passada (equivalente a ta.rsi).
+    """
+    n = close.shape[0]
+    ganhos = np.empty(n)
+    perdas = np.empty(n)
+    ganhos[0] = math.nan
+    perdas[0] = math.nan
+    for i in range(1, n):
+        delta = close[i] - close[i - 1]
+        ganhos[i] = delta if delta > 0.0 else 0.0
+        perdas[i] = -delta if delta < 0.0 else 0.0
+
+    media_ganhos = rma_wilder(ganhos, length)
+    media_perdas = rma_wilder(perdas, length)
+
+    out = np.empty(n)
+    for i in range(n):
+        total = media_ganhos[i] + media_perdas[i]
+        out[i] = 100.0 * media_ganhos[i] / total if total != 0.0 else math.nan
+    return out
+
+
+@njit(cache=True)
+def ema(close: np.ndarray, length: int) -> np.ndarray:
+    """
+    EMA semeada com a SMA dos primeiros length valores (como ta.ema).
+    """
+    n = close.shape[0]
+    out = np.full(n, math.nan)
+    if n < length:
+        return out
+
+    alpha = 2.0 / (length + 1.0)
+    valor = close[:length].mean()
+    out[length - 1] = valor
+    for i in range(length, n):
+        valor = alpha * close[i] + (1.0 - alpha) * valor
+        out[i] = valor
+    return out
+
+
+@njit(cache=True)
+def sma(x: np.ndarray, length: int) -> np.ndarray:
+    """
+    Média móvel simples com soma acumulada da janela (como ta.sma); NaN até
+    completar a primeira janela.
+    """
+    n = x.shape[0]
+    out = np.full(n, math.nan)
+    soma = 0.0
+    for i in range(n):
+        soma += x[i]
+        if i >= length:
+            soma -= x[i - length]
+        if i >= length - 1:
+            out[i] = soma / length
+    return out
+
+
+@njit(cache=True)
+def bandas_bollinger(close: np.ndarray, length: int, desvios: float):
+    """
+    Bandas de Bollinger (como ta.bbands, desvio padrão populacional). A média
+    da janela sai da mesma passada; o desvio é calculado em torno dela,
+    estável mesmo para preços altos.
+    """
+    n = close.shape[0]
+    superior = np.full(n, math.nan)
+    inferior = np.full(n, math.nan)
+    soma = 0.0
+    for i in range(n):
+        soma += close[i]
+        if i >= length:
+            soma -= close[i - length]
+        if i >= length - 1:
+            media = soma / length
+            quadrados = 0.0
+            for j in range(i - length + 1, i + 1):
+                quadrados += (close[j] - media) ** 2
+            largura = desvios * math.sqrt(quadrados / length)
+            superior[i] = media + largura
+            inferior[i] = media - largura
+    return superior, inferior
+
+
+@njit(cache=True)
+def momentum(close: np.ndarray, length: int) -> np.ndarray:
+    """
+    Diferença entre o fechamento atual e o de length períodos atrás (ta.mom).
+    """
+    n = close.shape[0]
+    out = np.full(n, math.nan)
+    for i in range(length, n):
+        out[i] = close[i] - close[i - length]
+    return out
+
+
+def aquecer_kernels() -> None:
+    """
+    Compila (ou carrega do cache em disco) os kernels JIT, para que a primeira
+    rodada da estratégia não pague o custo de compilação.
+    """
+    amostra = np.linspace(1.0, 2.0, 32)
+    desvio_padrao_welford(amostra, 14)
+    rsi_wilder(amostra, 7)
+    ema(amostra, 9)
+    sma(amostra, 10)
+    bandas_bollinger(amostra, 20, 2.0)
+    momentum(amostra, 10)
@@ -1,58 +1,42 @@
-import os
-import logging
-import ast
+import asyncio
+import sys
 from trading_bot import TradingBot
-from dotenv import load_dotenv
-
-# Configuração do logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s %(message)s",
-    handlers=[
-        logging.FileHandler("bot_stop.log", mode="a"),
-        logging.StreamHandler(),
-    ],
-)
-
-# Ajusta o nível de logging das bibliotecas HTTP para WARNING
-logging.getLogger("urllib3").setLevel(logging.WARNING)
-logging.getLogger("requests").setLevel(logging.WARNING)
-logging.getLogger("openai").setLevel(logging.WARNING)
-logging.getLogger("httpx").setLevel(logging.WARNING)
+from config import BotConfig
+from log_config import setup_logging
 
+try:
+    import uvloop
+except ImportError:  # uvloop é opcional (não existe no Windows)
+    uvloop = None
 
-# Ajusta o nível de logging das bibliotecas HTTP para WARNING
-logging.getLogger("urllib3").setLevel(logging.WARNING)
-logging.getLogger("requests").setLevel(logging.WARNING)
-logging.getLogger("openai").setLevel(logging.WARNING)
-logging.getLogger("httpx").setLevel(logging.WARNING)
+# Configuração do logging
+setup_logging("bot_stop.log")
 
 
 if __name__ == "__main__":
-    load_dotenv()
-
     # Configurações de API e símbolos
-    binance_api_key = os.getenv("BINANCE_API_KEY")
-    binance_secret_key = os.getenv("BINANCE_SECRET_KEY")
-    openai_api_key = os.getenv("OPENAI_API_KEY")
-    cryptocompare_api_key = os.getenv("CRYPTOCOMPARE_API_KEY")
-    symbols = ast.literal_eval(os.getenv("SYMBOLS"))
-    casas_decimais = ast.literal_eval(os.getenv("CASAS_DECIMAIS"))
-    min_notional = ast.literal_eval(os.getenv("MIN_NOTIONAL"))
+    config = BotConfig.load()
 
     # Inicializar o bot de compra
     bot = TradingBot(
-        binance_api_key=binance_api_key,
-        binance_secret_key=binance_secret_key,
-        openai_api_key=openai_api_key,
-        cryptocompare_api_key=cryptocompare_api_key,
-        symbols=symbols,
-        casas_decimais=casas_decimais,
-        min_notional=min_notional,
+        binance_api_key=config.binance_api_key,
+        binance_secret_key=config.binance_secret_key,
+        openai_api_key=config.openai_api_key,
+        cryptocompare_api_key=config.cryptocompare_api_key,
+        symbols=config.symbols,
+        casas_decimais=config.casas_decimais,
+        min_notional=config.min_notional,
         modo="moderado",
         timestamp_file="timestamps.json",
     )
 
-    # Loop sobre cada símbolo para aplicar a estratégia
-    for symbol in symbols.keys():
-        bot.iniciar_estrategia(symbol)
+    # Usa o event loop do libuv quando disponível (menor latência de I/O)
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+    if "--continuo" in sys.argv:
+        # Uma rodada a cada vela fechada, sem depender de agendador externo
+        asyncio.run(bot.executar_estrategias_agendadas(config.simbolos))
+    else:
+        # Aplica a estratégia a todos os símbolos em paralelo
+        asyncio.run(bot.executar_estrategias(config.simbolos))
@@ -0,0 +1,27 @@
+from trading_bot import TradingBot
+from config import BotConfig
+from log_config import setup_logging
+
+# Configuração do logging
+setup_logging("bot_stream.log")
+
+
+if __name__ == "__main__":
+    # Configurações de API e símbolos
+    config = BotConfig.load()
+
+    # Inicializar o bot
+    bot = TradingBot(
+        binance_api_key=config.binance_api_key,
+        binance_secret_key=config.binance_secret_key,
+        openai_api_key=config.openai_api_key,
+        cryptocompare_api_key=config.cryptocompare_api_key,
+        symbols=config.symbols,
+        casas_decimais=config.casas_decimais,
+        min_notional=config.min_notional,
+        modo="moderado",
+        timestamp_file="timestamps.json",
+    )
+
+    # Executa a estratégia a cada vela fechada recebida pelo WebSocket
+    bot.executar_estrategias_stream(config.simbolos)
@@ -0,0 +1,58 @@
+import atexit
+import functools
+import logging
+import logging.config
+import logging.handlers
+import queue
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s %(message)s"
+
+# Bibliotecas HTTP muito verbosas, limitadas a WARNING
+BIBLIOTECAS_SILENCIADAS = ("urllib3", "requests", "openai", "httpx")
+
+# Rotação do arquivo de log: até 5 arquivos antigos de 20 MB
+LOG_MAX_BYTES = 20_000_000
+LOG_BACKUPS = 5
+
+
+@functools.cache
+def setup_logging(log_file: str, level: int = logging.INFO) -> None:
+    """
+    Configura o logging do processo uma única vez: arquivo de log rotativo +
+    console. Os registros passam por uma fila e são gravados por uma thread
+    própria, para que as chamadas de log não esperem pela escrita em disco.
+    Chamadas repetidas com o mesmo arquivo não fazem nada.
+    """
+    # O formato não usa thread/processo; evita essas consultas em cada registro
+    logging.logThreads = False
+    logging.logMultiprocessing = False
+    logging.logProcesses = False
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    arquivo = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8"
+    )
+    console = logging.StreamHandler()
+    for handler in (arquivo, console):
+        handler.setFormatter(formatter)
+
+    fila: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(
+        fila, arquivo, console, respect_handler_level=True
+    )
+
+    logging.config.dictConfig(
+        {
+            "version": 1,
+            "disable_existing_loggers": False,
+            "loggers": {
+                nome: {"level": "WARNING"} for nome in BIBLIOTECAS_SILENCIADAS
+            },
+            "root": {"level": level, "handlers": []},
+        }
+    )
+    logging.getLogger().addHandler(logging.handlers.QueueHandler(fila))
+
+    listener.start()
+    # Esvazia a fila antes de o processo terminar
+    atexit.register(listener.stop)
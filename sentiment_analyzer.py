@@ -1,14 +1,44 @@
+import hashlib
 import logging
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+from typing import Dict, Optional
+
 import requests
 import openai
 
+from database_manager import DatabaseManager, obter_database_manager
+from http_session import TIMEOUT_PADRAO, criar_sessao, ler_json
+
 logger = logging.getLogger(__name__)
 
+CRYPTOCOMPARE_NEWS_URL = "https://min-api.cryptocompare.com/data/v2/news/"
+NOTICIAS_TTL = 10 * 60  # notícias reaproveitadas por 10 minutos
+NOTICIAS_MAX_CACHE = 64
+RESPOSTAS_TTL = 60 * 60  # respostas do LLM reaproveitadas por 1 hora
+
 
 class SentimentAnalyzer:
-    def __init__(self, openai_api_key: str, cryptocompare_api_key: str):
+    def __init__(
+        self,
+        openai_api_key: str,
+        cryptocompare_api_key: str,
+        database_manager: Optional[DatabaseManager] = None,
+    ):
         openai.api_key = openai_api_key
         self.cryptocompare_api_key = cryptocompare_api_key
+        # Sessão HTTP reaproveitada pelas consultas de notícias
+        self.session = criar_sessao()
+        # Notícias por (símbolo, janela de 10 minutos): rodadas seguidas sobre
+        # os mesmos símbolos não repetem a consulta à CryptoCompare
+        self._cache_noticias: "OrderedDict[tuple, list]" = OrderedDict()
+        self._lock_noticias = threading.Lock()
+        # Respostas do LLM pelo hash do prompt: em memória e no SQLite, para que
+        # as mesmas manchetes não sejam reenviadas nem depois de um reinício
+        self.database_manager = database_manager or obter_database_manager()
+        self._respostas: Dict[str, tuple] = {}
 
     def analisar_sentimento(self, symbol: str) -> str:
         try:
@@ -17,44 +47,110 @@ class SentimentAnalyzer:
         except requests.RequestException as e:
             logger.error(f"Erro ao coletar notícias para {symbol}: {e}")
             return "Neutro"  # Falha ao coletar notícias resulta em sentimento Neutro
-        except openai.error.OpenAIError as e:
+        except openai.OpenAIError as e:
             logger.error(f"Erro ao analisar sentimento via OpenAI para {symbol}: {e}")
             return "Neutro"
         except Exception as e:
             logger.error(f"Erro inesperado ao analisar sentimento para {symbol}: {e}")
             return "Neutro"
 
-    def _coletar_noticias(self, symbol: str) -> list:
-        params = {
+    def _parametros_noticias(self, symbol: str) -> dict:
+        return {
             "categories": symbol,
             "lang": "EN",
             "api_key": self.cryptocompare_api_key,
         }
-        response = requests.get(
-            "https://min-api.cryptocompare.com/data/v2/news/",
-            params=params,
-            timeout=20,  # Set the timeout to 20 seconds
+
+    @staticmethod
+    def _chave_noticias(symbol: str) -> tuple:
+        return (symbol, int(time.time() // NOTICIAS_TTL))
+
+    def _noticias_em_cache(self, chave: tuple) -> Optional[list]:
+        with self._lock_noticias:
+            return self._cache_noticias.get(chave)
+
+    def _guardar_noticias(self, chave: tuple, artigos: list) -> list:
+        with self._lock_noticias:
+            self._cache_noticias[chave] = artigos
+            while len(self._cache_noticias) > NOTICIAS_MAX_CACHE:
+                self._cache_noticias.popitem(last=False)
+        return artigos
+
+    def _coletar_noticias(self, symbol: str) -> list:
+        chave = self._chave_noticias(symbol)
+        artigos = self._noticias_em_cache(chave)
+        if artigos is not None:
+            return artigos
+
+        response = self.session.get(
+            CRYPTOCOMPARE_NEWS_URL,
+            params=self._parametros_noticias(symbol),
+            timeout=TIMEOUT_PADRAO,
         )
         response.raise_for_status()
-        return response.json().get("Data", [])
+        # Decodifica direto dos bytes, sem passar pelo texto da resposta
+        return self._guardar_noticias(chave, ler_json(response.content).get("Data", []))
+
+    @staticmethod
+    def _montar_prompt(artigos: list, symbol: str) -> str:
+        textos = " ".join(artigo["title"] for artigo in islice(artigos, 5))
+        return f"Analise o seguinte texto e determine o sentimento geral sobre {symbol}. E responda somente: Positivo, Negativo ou Neutro, conforme sua análise quanto a essa criptomoeda. Textos: {textos}"
+
+    @staticmethod
+    def _parametros_openai(prompt: str) -> dict:
+        return dict(
+            model="gpt-3.5-turbo",
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=10,
+            n=1,
+            stop=None,
+            temperature=0.5,
+        )
+
+    @staticmethod
+    def _chave_prompt(prompt: str) -> str:
+        return hashlib.blake2b(prompt.encode(), digest_size=16).hexdigest()
+
+    def _resposta_em_cache(self, chave: str) -> Optional[str]:
+        agora = int(time.time())
+        em_memoria = self._respostas.get(chave)
+        if em_memoria is not None and agora - em_memoria[0] < RESPOSTAS_TTL:
+            return em_memoria[1]
+
+        valor = self.database_manager.obter_llm_cache(chave, agora - RESPOSTAS_TTL)
+        if valor is not None:
+            self._respostas[chave] = (agora, valor)
+        return valor
+
+    def _guardar_resposta(self, chave: str, valor: str) -> str:
+        agora = int(time.time())
+        # Descarta as entradas vencidas antes de acrescentar a nova
+        for antiga in [
+            c for c, (ts, _) in self._respostas.items() if agora - ts >= RESPOSTAS_TTL
+        ]:
+            del self._respostas[antiga]
+        self._respostas[chave] = (agora, valor)
+        self.database_manager.salvar_llm_cache(chave, valor, agora)
+        return valor
 
     def _analisar_texto_noticias(self, artigos: list, symbol: str) -> str:
         if not artigos:
             return "Neutro"
 
-        textos = " ".join([artigo["title"] for artigo in artigos[:5]])
-        prompt = f"Analise o seguinte texto e determine o sentimento geral sobre {symbol}. E responda somente: Positivo, Negativo ou Neutro, conforme sua análise quanto a essa criptomoeda. Textos: {textos}"
+        prompt = self._montar_prompt(artigos, symbol)
+        chave = self._chave_prompt(prompt)
+        em_cache = self._resposta_em_cache(chave)
+        if em_cache is not None:
+            return em_cache
+
         try:
             resposta = openai.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=10,
-                n=1,
-                stop=None,
-                temperature=0.5,
+                **self._parametros_openai(prompt)
             )
 
-            return resposta.choices[0].message.content.strip()
-        except openai.error.OpenAIError as e:
+            return self._guardar_resposta(
+                chave, resposta.choices[0].message.content.strip()
+            )
+        except openai.OpenAIError as e:
             logger.error(f"Erro na API OpenAI: {e}")
             return "Neutro"
@@ -1,43 +1,171 @@
 # telegram_notifier_refatorado.py
+import atexit
 import logging
+import queue
+import threading
+import time
+from typing import List, Optional, Tuple
+
 import requests
-import os
+
+from http_session import criar_sessao
 
 logger = logging.getLogger(__name__)
 
 
+# Limite de mensagens pendentes; acima disso as novas são descartadas
+TAMANHO_FILA = 1000
+
+# Timeout de conexão e de leitura de cada envio, em segundos
+TIMEOUT_ENVIO = (3, 5)
+
+# Mensagens que chegam dentro desta janela (segundos) saem em um único envio
+JANELA_AGRUPAMENTO = 0.5
+
+# Limite de caracteres de uma mensagem do Telegram
+LIMITE_MENSAGEM = 4096
+SEPARADOR_MENSAGENS = "\n\n---\n\n"
+
+# Marca "nenhum item retirado da fila" (None é o aviso de encerramento)
+_NADA = object()
+
+# Tempo máximo, ao encerrar o processo, para enviar as mensagens pendentes
+TIMEOUT_ENCERRAMENTO = 10
+
+
 class TelegramNotifier:
-    def __init__(self, bot_token: str, chat_id: str):
+    def __init__(self, bot_token: str, chat_id: str, tentativas: int = 5):
         self.bot_token = bot_token
         self.chat_id = chat_id
         self.api_url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
+        # Sessão reaproveitada: as retentativas com backoff ficam no adapter.
+        # Um único host e uma única thread de envio: basta uma conexão
+        self.session = criar_sessao(tentativas, conexoes=1)
 
-    def enviar_mensagem(
-        self, mensagem: str, parse_mode: str = "Markdown", tentativas=5
-    ):
+        # Os envios saem de uma thread própria: quem notifica só enfileira
+        self._fila: "queue.Queue[Optional[dict]]" = queue.Queue(TAMANHO_FILA)
+        self._worker = threading.Thread(
+            target=self._processar_fila, name="telegram-notifier", daemon=True
+        )
+        self._worker.start()
+        atexit.register(self.encerrar)
+
+    def enviar_mensagem(self, mensagem: str, parse_mode: str = "Markdown"):
+        """
+        Enfileira a mensagem para envio em segundo plano, sem bloquear.
+        """
         payload = {"chat_id": self.chat_id, "text": mensagem, "parse_mode": parse_mode}
+        try:
+            self._fila.put_nowait(payload)
+        except queue.Full:
+            logger.warning("Fila do Telegram cheia; mensagem descartada.")
+
+    def flush(self, timeout: float = TIMEOUT_ENCERRAMENTO) -> bool:
+        """
+        Aguarda até timeout segundos o envio das mensagens já enfileiradas, sem
+        encerrar a thread de envio. Retorna True se a fila foi esvaziada.
+        """
+        fila = self._fila
+        with fila.all_tasks_done:
+            return fila.all_tasks_done.wait_for(
+                lambda: not fila.unfinished_tasks, timeout
+            )
+
+    def encerrar(self, timeout: float = TIMEOUT_ENCERRAMENTO):
+        """
+        Envia as mensagens pendentes, encerra a thread de envio e fecha a
+        conexão com o Telegram.
+        """
+        if not self._worker.is_alive():
+            return
+        try:
+            self._fila.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._worker.join(timeout)
+        if not self._worker.is_alive():
+            self.session.close()
+
+    def _processar_fila(self):
+        proximo = self._fila.get()
+        while proximo is not None:
+            lote, proximo = self._agrupar(proximo)
+            try:
+                self._enviar_lote(lote)
+            finally:
+                for _ in lote:
+                    self._fila.task_done()
+            if proximo is _NADA:
+                proximo = self._fila.get()
+        self._fila.task_done()
 
-        for i in range(tentativas):
+    def _agrupar(self, primeiro: dict) -> Tuple[List[dict], object]:
+        """
+        Junta ao primeiro payload as mensagens que chegarem na janela de
+        agrupamento, com o mesmo parse_mode e dentro do limite de tamanho.
+        Retorna o lote e o item que ficou de fora (ou _NADA).
+        """
+        lote = [primeiro]
+        tamanho = len(primeiro["text"])
+        prazo = time.monotonic() + JANELA_AGRUPAMENTO
+        while True:
+            restante = prazo - time.monotonic()
             try:
-                response = requests.post(self.api_url, data=payload)
-                response.raise_for_status()
-                logger.info("Mensagem enviada com sucesso para o Telegram.")
-                break
-            except requests.ConnectionError as e:
-                logger.error(
-                    f"Erro de conexão ao enviar mensagem para o Telegram: {e}. Tentando novamente ({i+1}/{tentativas})"
-                )
-                if i == tentativas - 1:
-                    logger.error(
-                        "Falha definitiva no envio da mensagem após várias tentativas."
-                    )
-            except requests.Timeout as e:
-                logger.error(
-                    f"Tempo de espera excedido para o Telegram: {e}. Tentando novamente ({i+1}/{tentativas})"
-                )
-            except requests.RequestException as e:
-                logger.error(f"Erro ao enviar mensagem para o Telegram: {e}")
-                break  # Não tenta novamente para outros tipos de erros
+                if restante > 0:
+                    item = self._fila.get(timeout=restante)
+                else:
+                    item = self._fila.get_nowait()
+            except queue.Empty:
+                return lote, _NADA
+
+            if (
+                item is None
+                or item["parse_mode"] != primeiro["parse_mode"]
+                or tamanho + len(SEPARADOR_MENSAGENS) + len(item["text"])
+                > LIMITE_MENSAGEM
+            ):
+                return lote, item
+            lote.append(item)
+            tamanho += len(SEPARADOR_MENSAGENS) + len(item["text"])
+
+    def _enviar_lote(self, lote: List[dict]):
+        """
+        Envia o lote em uma única mensagem. Se o Telegram recusá-la (em geral
+        Markdown inválido em uma das partes), cada mensagem sai sozinha, e a que
+        ainda for recusada vai como texto simples: uma mensagem malformada não
+        derruba as notificações em volta dela.
+        """
+        if len(lote) > 1:
+            juntas = dict(
+                lote[0], text=SEPARADOR_MENSAGENS.join(p["text"] for p in lote)
+            )
+            if self._enviar(juntas):
+                return
+
+        for payload in lote:
+            if not self._enviar(payload):
+                self._enviar({k: v for k, v in payload.items() if k != "parse_mode"})
+
+    def _enviar(self, payload: dict) -> bool:
+        """
+        Retorna False só quando o Telegram recusa a mensagem (400); outras
+        falhas são registradas e a mensagem é descartada.
+        """
+        try:
+            response = self.session.post(
+                self.api_url, data=payload, timeout=TIMEOUT_ENVIO
+            )
+            response.raise_for_status()
+            logger.info("Mensagem enviada com sucesso para o Telegram.")
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 400:
+                logger.warning(f"Mensagem recusada pelo Telegram: {e}")
+                return False
+            logger.error(f"Erro ao enviar mensagem para o Telegram: {e}")
+        except requests.RequestException as e:
+            # A notificação não afeta a operação: após as retentativas, descarta
+            logger.error(f"Erro ao enviar mensagem para o Telegram: {e}")
+        return True
 
     def notificar(
         self,
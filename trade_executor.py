@@ -1,137 +1,272 @@
+import json
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+from binance import ThreadedWebsocketManager
 from binance.client import Client
 from binance.exceptions import BinanceAPIException, BinanceRequestException
-import traceback
+
+from binance_client import RECV_WINDOW_ORDENS
+from exchange_info import (
+    CODIGOS_FILTRO_DESATUALIZADO,
+    LotSize,
+    invalidar_exchange_info,
+    obter_filtros_simbolos,
+)
 
 logger = logging.getLogger(__name__)
 
+# Idade máxima (segundos) de um preço do WebSocket; acima disso consulta a API
+PRECO_STREAM_TTL = 10
+
+
+@lru_cache(maxsize=None)
+def _step_decimal(step_size) -> Decimal:
+    # Aceita o step como float ou como o texto da Binance ("0.01000000").
+    # normalize() remove zeros à direita: 1.0 vira 1, e o resultado não ganha
+    # casas decimais que a Binance rejeitaria
+    return Decimal(str(step_size)).normalize()
+
+
+def _arredondar_para_step(quantidade: float, step_size: float) -> float:
+    """
+    Arredonda a quantidade para baixo ao múltiplo de step_size, com divisão
+    inteira exata em Decimal (sem o resíduo binário de quantidade % step).
+    """
+    step = _step_decimal(step_size)
+    return float((Decimal(str(quantidade)) // step) * step)
+
+
+def preco_medio_fills(fills: list) -> Tuple[float, float]:
+    """
+    Retorna (preço médio ponderado pela quantidade, taxa total) dos fills de
+    uma ordem. Ordens a mercado grandes varrem vários níveis do livro, e o
+    preço do primeiro fill não representa o preço efetivo da ordem.
+    """
+    quantidade = Decimal(0)
+    notional = Decimal(0)
+    taxa = Decimal(0)
+    for fill in fills:
+        qty = Decimal(fill["qty"])
+        quantidade += qty
+        notional += Decimal(fill["price"]) * qty
+        taxa += Decimal(fill.get("commission") or 0)
+    if not quantidade:
+        raise ValueError("Ordem sem fills: não há preço médio a calcular")
+    return float(notional / quantidade), float(taxa)
+
+
+def preco_medio_ordem(ordem: dict) -> Tuple[float, float]:
+    """
+    Retorna (preço médio, taxa total) de uma ordem executada. Respostas sem
+    fills (newOrderRespType ACK ou RESULT) usam o total executado da ordem,
+    sem a taxa, que só vem nos fills.
+    """
+    if ordem.get("fills"):
+        return preco_medio_fills(ordem["fills"])
+
+    executado = Decimal(ordem.get("executedQty") or 0)
+    if not executado:
+        raise ValueError(
+            f"Ordem {ordem.get('orderId')} enviada, mas a resposta não informa "
+            "a quantidade executada"
+        )
+    return float(Decimal(ordem["cummulativeQuoteQty"]) / executado), 0.0
+
 
 class TradeExecutor:
     def __init__(self, client: Client):
         self.client = client
+        # Último preço de cada símbolo vindo do bookTicker: (preço, monotonic)
+        self._precos: Dict[str, Tuple[float, float]] = {}
+        self._acompanhando_precos = False
+        # Saldo livre de cada ativo, mantido pelo user data stream da conta ou
+        # pela consulta de início de rodada (preparar_rodada)
+        self._saldos: Dict[str, float] = {}
+        self._acompanhando_saldos = False
+        self._twm: Optional[ThreadedWebsocketManager] = None
+        # Consultas independentes que antecedem uma ordem saem em paralelo,
+        # pelo mesmo pool de conexões HTTP do client
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="consultas")
+
+    def _obter_twm(self) -> ThreadedWebsocketManager:
+        if self._twm is None:
+            self._twm = ThreadedWebsocketManager(
+                api_key=self.client.API_KEY, api_secret=self.client.API_SECRET
+            )
+            self._twm.start()
+        return self._twm
+
+    def acompanhar_precos(self, symbols: Iterable[str]) -> None:
+        """
+        Assina o stream bookTicker dos símbolos e mantém em memória o último
+        preço de cada um, para que obter_preco_atual não precise de uma
+        requisição REST a cada ordem.
+        """
+        if self._acompanhando_precos:
+            return
+
+        def ao_receber(mensagem: dict) -> None:
+            evento = mensagem.get("data", mensagem)
+            if "b" not in evento or "a" not in evento:
+                logger.error(f"Mensagem inesperada do bookTicker: {mensagem}")
+                return
+            # Preço médio entre a melhor oferta de compra e a de venda
+            preco = (float(evento["b"]) + float(evento["a"])) / 2
+            self._precos[evento["s"]] = (preco, time.monotonic())
+
+        self._obter_twm().start_multiplex_socket(
+            callback=ao_receber,
+            streams=[f"{symbol.lower()}@bookTicker" for symbol in symbols],
+        )
+        self._acompanhando_precos = True
+
+    def preparar_rodada(self, symbols: Iterable[str]) -> None:
+        """
+        Antes de uma rodada de estratégias, obtém os saldos de todos os ativos
+        (um get_account) e os preços de todos os símbolos (um ticker/price com
+        a lista de símbolos), em vez de uma consulta de cada por símbolo.
+        """
+        conta = self.client.get_account(recvWindow=60000)
+        self._saldos.update(
+            {saldo["asset"]: float(saldo["free"]) for saldo in conta["balances"]}
+        )
+
+        tickers = self.client.get_symbol_ticker(
+            symbols=json.dumps(list(symbols), separators=(",", ":"))
+        )
+        agora = time.monotonic()
+        for ticker in tickers:
+            self._precos[ticker["symbol"]] = (float(ticker["price"]), agora)
+
+    def acompanhar_saldos(self) -> None:
+        """
+        Assina o user data stream da conta (o listen key é criado e renovado
+        pelo ThreadedWebsocketManager) e mantém em memória o saldo livre de cada
+        ativo, atualizado a cada evento outboundAccountPosition.
+        """
+        if self._acompanhando_saldos:
+            return
+
+        def ao_receber(mensagem: dict) -> None:
+            tipo = mensagem.get("e")
+            if tipo == "outboundAccountPosition":
+                for saldo in mensagem["B"]:
+                    self._saldos[saldo["a"]] = float(saldo["f"])
+            elif tipo == "error":
+                # Sem o stream os saldos em memória podem ficar defasados
+                logger.error(f"Erro no user data stream: {mensagem}")
+                self._acompanhando_saldos = False
+                self._saldos.clear()
+
+        self._obter_twm().start_user_socket(callback=ao_receber)
+        self._acompanhando_saldos = True
+
+    def parar_streams(self) -> None:
+        """
+        Encerra os streams de preços e de saldos.
+        """
+        if self._twm is not None:
+            self._twm.stop()
+            self._twm = None
+        self._acompanhando_precos = False
+        self._acompanhando_saldos = False
+        self._precos.clear()
+        self._saldos.clear()
+
+    def _guardar_saldo(self, ativo: str, saldo: float) -> None:
+        # Só com o stream ativo o saldo em memória é mantido atualizado; um
+        # valor já recebido pelo stream é mais novo que o da consulta REST
+        if self._acompanhando_saldos:
+            self._saldos.setdefault(ativo, saldo)
+
+    def obter_preco_atual(self, symbol: str) -> float:
+        """
+        Retorna o preço atual do símbolo: o do stream, se recente, ou o da API.
+        """
+        em_memoria = self._precos.get(symbol)
+        if (
+            em_memoria is not None
+            and time.monotonic() - em_memoria[1] < PRECO_STREAM_TTL
+        ):
+            return em_memoria[0]
+        return float(self.client.get_symbol_ticker(symbol=symbol)["price"])
 
     def executar_compra(
         self, symbol: str, quantidade: float, stop_loss: float, take_profit: float
     ):
+        """
+        Compra a mercado (pelo mesmo caminho de executar_ordem) e protege a
+        posição com um stop loss na Binance. Retorna o preço médio da compra.
+        O bot não usa este método: suas compras passam por executar_ordem e a
+        saída é feita pelo stop móvel do TradingBot, com venda a mercado.
+        """
+        resultado = self._executar_ordem_mercado(symbol, "BUY", quantidade)
+        if resultado is None:
+            return None
+
+        preco_compra, _ = resultado
+        if take_profit:
+            # Sem OCO, o take profit não vai para a Binance: a saída com lucro
+            # fica a cargo de quem chama
+            logger.warning(
+                f"Take profit de {take_profit}% para {symbol} não é enviado à Binance."
+            )
         try:
-            ordem = self.client.order_market_buy(symbol=symbol, quantity=quantidade)
-            logger.info(f"Ordem de compra executada: {ordem}")
-            preco_compra = float(ordem["fills"][0]["price"])
             self._configurar_stop_loss(symbol, quantidade, preco_compra, stop_loss)
-            return preco_compra
-        except BinanceAPIException as e:
-            logger.error(f"Erro ao executar compra: {e}")
-            if e.code in [1100, -1000]:  # Erros temporários da Binance
-                logger.info("Tentando novamente após erro temporário.")
-                return self._retry_order_market_buy(symbol, quantidade)
-            return None
         except BinanceRequestException as e:
             logger.error(f"Erro de requisição com a Binance: {e}")
-            return None
         except Exception as e:
-            logger.error(f"Erro inesperado: {e}")
-            traceback.print_exc()
-            return None
-
-    def _retry_order_market_buy(self, symbol: str, quantidade: float, tentativas=3):
-        """Tenta novamente a ordem de compra em caso de erro temporário."""
-        for i in range(tentativas):
-            try:
-                logger.info(f"Tentativa {i+1} de recompra.")
-                ordem = self.client.order_market_buy(
-                    symbol=symbol, quantity=quantidade, recvWindow=60000
-                )
-                preco_compra = float(ordem["fills"][0]["price"])
-                return preco_compra
-            except BinanceAPIException as e:
-                logger.error(f"Tentativa {i+1} falhou: {e}")
-                if i == tentativas - 1:
-                    logger.error("Excedido número de tentativas.")
-        return None
-
-    def executar_venda(self, symbol: str, quantidade: float):
-        try:
-            ordem = self.client.order_market_sell(
-                symbol=symbol, quantity=quantidade, recvWindow=60000
-            )
-            logger.info(f"Ordem de venda executada: {ordem}")
-            return float(ordem["fills"][0]["price"])
-        except BinanceAPIException as e:
-            logger.error(f"Erro ao executar venda: {e}")
-            return None
+            logger.exception(f"Erro inesperado: {e}")
+        return preco_compra
 
     def _get_lot_size_and_min_notional(self, symbol: str):
         """Obtém o tamanho mínimo, máximo e incremento do lote e o valor mínimo de notional para o símbolo."""
-        exchange_info = self.client.get_exchange_info()
-        lot_size = None
-        min_notional = None
-
-        for s in exchange_info["symbols"]:
-            if s["symbol"] == symbol:
-                for f in s["filters"]:
-
-                    if f["filterType"] == "LOT_SIZE":
-                        lot_size = {
-                            "min_qty": float(f["minQty"]),
-                            "max_qty": float(f["maxQty"]),
-                            "step_size": float(f["stepSize"]),
-                        }
-                    if f["filterType"] == "NOTIONAL":
-                        min_notional = float(f["minNotional"])
-
-                # Verifica se obteve tanto o LOT_SIZE quanto o MIN_NOTIONAL
-                if lot_size is None:
-                    raise ValueError(f"LOT_SIZE não encontrado para o símbolo {symbol}")
-                if min_notional is None:
-                    logger.warning(
-                        f"MIN_NOTIONAL não encontrado para o símbolo {symbol}, definindo valor padrão."
-                    )
-                    min_notional = 0  # Ou outro valor padrão que faça sentido
-
-                return lot_size, min_notional
+        # Filtros já convertidos e indexados por símbolo, a partir do exchange
+        # info em cache: sem baixar nem percorrer a lista de símbolos a cada ordem
+        filtros = obter_filtros_simbolos(self.client).get(symbol)
+        if filtros is None:
+            raise ValueError(
+                f"Não foi possível encontrar informações para o símbolo: {symbol}"
+            )
+        lot_size, min_notional, _ = filtros
+
+        # Verifica se obteve tanto o LOT_SIZE quanto o MIN_NOTIONAL
+        if lot_size is None:
+            raise ValueError(f"LOT_SIZE não encontrado para o símbolo {symbol}")
+        if min_notional is None:
+            logger.warning(
+                f"MIN_NOTIONAL não encontrado para o símbolo {symbol}, definindo valor padrão."
+            )
+            min_notional = 0  # Ou outro valor padrão que faça sentido
 
-        raise ValueError(
-            f"Não foi possível encontrar informações para o símbolo: {symbol}"
-        )
+        return lot_size, min_notional
 
-    def _ajustar_quantidade_venda(self, symbol: str, quantidade: float):
+    def _ajustar_quantidade_venda(
+        self, symbol: str, quantidade: float, lot_size: Optional[LotSize] = None
+    ):
         """
-        Ajusta a quantidade para atender ao step size do símbolo.
+        Ajusta a quantidade para atender ao step size do símbolo. Quem já tem o
+        lot_size (de _get_lot_size_and_min_notional) pode repassá-lo.
         """
         try:
-            logging.info(f"quantidade antes: {quantidade}")
-
-            # Obtém as informações de trading do símbolo
-            info = self.client.get_symbol_info(symbol)
-            if not info:
-                raise ValueError(f"Informações do símbolo {symbol} não encontradas.")
-
-            # Obtém o filtro de tamanho de lote (LOT_SIZE)
-            filters = {f["filterType"]: f for f in info["filters"]}
-            lot_size = filters.get("LOT_SIZE")
+            logger.debug("quantidade antes: %s", quantidade)
 
-            if not lot_size:
-                raise ValueError(
-                    f"Filtro LOT_SIZE não encontrado para o símbolo {symbol}."
-                )
-
-            # Step size
-            step_size = float(lot_size["stepSize"])
-
-            quantidade = float(quantidade)
-            step_size = float(step_size)
+            if lot_size is None:
+                lot_size, _ = self._get_lot_size_and_min_notional(symbol)
 
             # Ajuste a quantidade com base no step size
-            quantidade_ajustada = round(quantidade // step_size * step_size, 8)
-
-            # Formatar a quantidade para garantir que não tenha mais casas decimais que o necessário
-            quantidade_ajustada_str = f"{quantidade_ajustada:.8f}".rstrip("0").rstrip(
-                "."
+            quantidade_ajustada = _arredondar_para_step(
+                float(quantidade), lot_size.step_size
             )
 
-            logging.info(f"quantidade ajustada: {quantidade_ajustada_str}")
+            logger.debug("quantidade ajustada: %s", quantidade_ajustada)
 
-            return float(quantidade_ajustada_str)
+            return quantidade_ajustada
 
         except Exception as e:
             logger.error(f"Erro ao ajustar quantidade para {symbol}: {e}")
@@ -143,22 +278,20 @@ class TradeExecutor:
         quantidade = float(quantidade)
         step_size = float(step_size)
 
-        logger.info(f"quantidade: {quantidade}, step_size: {step_size}")
-
-        # Calcula a quantidade ajustada
-        quantidade_ajustada = round(quantidade - (quantidade % step_size), 8)
-
-        # A Binance espera um formato específico para a quantidade, asseguramos isso aqui
-        quantidade_ajustada_str = (
-            "{:0.8f}".format(quantidade_ajustada).rstrip("0").rstrip(".")
-        )
+        logger.debug("quantidade: %s, step_size: %s", quantidade, step_size)
 
-        return quantidade_ajustada_str
+        # Divisão inteira exata em Decimal: o resultado é múltiplo do step e já
+        # sai com as casas decimais do step, como a Binance espera
+        step = _step_decimal(step_size)
+        return format((Decimal(repr(quantidade)) // step) * step, "f")
 
     def verificar_saldo(self, symbol="USDT"):
-        logging.info(f"Verificando saldo disponível em {symbol}...")
-        saldo_base = self.client.get_asset_balance(asset=symbol, recvWindow=60000)
-        saldo_disponivel = float(saldo_base["free"])
+        logger.debug("Verificando saldo disponível em %s...", symbol)
+        saldo_disponivel = self._saldos.get(symbol)
+        if saldo_disponivel is None:
+            saldo_base = self.client.get_asset_balance(asset=symbol, recvWindow=60000)
+            saldo_disponivel = float(saldo_base["free"])
+            self._guardar_saldo(symbol, saldo_disponivel)
 
         logger.info(f"Saldo disponível em USDT: {saldo_disponivel}")
         return saldo_disponivel
@@ -171,10 +304,17 @@ class TradeExecutor:
                 # Remove os 4 últimos caracteres ('USDT') do símbolo
                 symbol = symbol[:-4]
 
-            logging.info(f"Verificando saldo disponível em {symbol}...")
+            logger.debug("Verificando saldo disponível em %s...", symbol)
+
+            saldo_disponivel = self._saldos.get(symbol)
+            if saldo_disponivel is not None:
+                logger.info(f"Saldo disponível em {symbol}: {saldo_disponivel}")
+                return saldo_disponivel
 
             # Obtém todas as informações da conta, incluindo saldos de todos os ativos
             conta = self.client.get_account(recvWindow=60000)
+            for asset in conta["balances"]:
+                self._guardar_saldo(asset["asset"], float(asset["free"]))
 
             # Filtra a lista de saldos para encontrar o ativo específico (symbol)
             for asset in conta["balances"]:
@@ -197,249 +337,267 @@ class TradeExecutor:
         ordem_tipo: str,
         venda_parcial: bool = False,
     ):
+        # Entradas inválidas são recusadas antes de qualquer requisição
+        executar = {"buy": self._ordem_compra, "sell": self._ordem_venda}.get(
+            ordem_tipo
+        )
+        if executar is None:
+            logger.error(f"Tipo de ordem inválido: {ordem_tipo}")
+            return None
+        if not symbol:
+            logger.error("Símbolo não informado para a ordem.")
+            return None
+
         try:
 
             quantidade = float(quantidade)
+            if not quantidade > 0:
+                logger.error(f"Quantidade inválida para {symbol}: {quantidade}")
+                return None
 
             # Obtém as restrições de LOT_SIZE e MIN_NOTIONAL para o par
             lot_size, min_notional = self._get_lot_size_and_min_notional(symbol)
 
-            if ordem_tipo == "buy":
-                # Verifica e ajusta a quantidade de acordo com o step_size
-                quantidade_ajustada_str = self._ajustar_quantidade(
-                    quantidade, lot_size["step_size"]
-                )
+            return executar(symbol, quantidade, lot_size, min_notional)
 
-                # Calcula o valor da ordem (preço * quantidade)
-                preco_atual = float(
-                    self.client.get_symbol_ticker(symbol=symbol)["price"]
-                )
-                quantidade_ajustada = float(quantidade_ajustada_str)
-                notional = float(preco_atual * quantidade_ajustada)
-
-                notional = float(notional)
-                min_notional = float(min_notional)
-                preco_atual = float(preco_atual)
-
-                # Verifica se o valor (notional) está acima do mínimo exigido
-                if notional < min_notional:
-                    logger.error(
-                        f"Valor da ordem ({notional}) é menor que o valor mínimo permitido ({min_notional}) para {symbol}."
-                    )
-
-                    # Forçar a quantidade ajustada para garantir que o notional seja maior que o mínimo
-                    quantidade_ajustada = (
-                        min_notional / preco_atual
-                    ) * 1.2  # Adiciona uma margem de 20%
-
-                    quantidade_ajustada_str = "{:f}".format(quantidade_ajustada)
-                    quantidade_ajustada_str = self._ajustar_quantidade(
-                        quantidade_ajustada_str, lot_size["step_size"]
-                    )
-
-                    # Recalcular o notional após o ajuste de quantidade
-                    notional = float(preco_atual) * float(quantidade_ajustada_str)
-
-                    if notional < min_notional:
-                        logger.error(
-                            f"Mesmo após ajuste, o valor ({notional}) é menor que o mínimo exigido ({min_notional}) para {symbol}."
-                        )
-                        return None
-
-                # Verifique se a quantidade ajustada está acima de minQty
-                if float(quantidade_ajustada_str) < float(lot_size["min_qty"]):
-                    logger.error(
-                        f"Quantidade ajustada ({quantidade_ajustada_str}) está abaixo do tamanho mínimo de lote permitido ({lot_size['min_qty']}) para {symbol}."
-                    )
-                    quantidade_ajustada_str = "{:0.8f}".format(lot_size["min_qty"])
-                    logger.info(
-                        f"Quantidade ajustada para o mínimo de lote permitido: {quantidade_ajustada_str}"
-                    )
-
-                saldo_disponivel = self.verificar_saldo("USDT")
-                saldo_disponivel = float(saldo_disponivel)
-
-                # Se o notional ajustado for maior que o saldo disponível, ajuste a quantidade novamente
-                if notional > saldo_disponivel:
-                    # Ajustar a quantidade com base no saldo disponível
-                    quantidade_ajustada = saldo_disponivel / preco_atual * 1.001
-                    quantidade_ajustada_str = self._ajustar_quantidade(
-                        quantidade_ajustada, lot_size["step_size"]
-                    )
-                    notional = preco_atual * float(quantidade_ajustada_str)
-
-                    logger.info(
-                        f"Quantidade ajustada para o saldo disponível: {quantidade_ajustada_str}, Notional: {notional}"
-                    )
-
-                # Verificar se o notional após o ajuste ainda é inferior ao mínimo permitido
-                if notional < min_notional:
-                    logger.error(
-                        f"Saldo insuficiente para executar a ordem. Notional ({notional}) é menor que o mínimo permitido ({min_notional})."
-                    )
-                    return None
-
-                # Execução da ordem após as verificações
-
-                resultado = self._executar_ordem_buy(
-                    symbol, quantidade_ajustada_str, 2, 4
-                )
+        except Exception as e:
+            logger.exception(f"Erro ao executar ordem: {e}")
+            return None
 
-                logger.info(f"Resultado da execução da ordem de compra: {resultado}")
+    def _ordem_compra(
+        self, symbol: str, quantidade: float, lot_size: LotSize, min_notional: float
+    ):
+        """
+        Ajusta a quantidade aos filtros do símbolo, ao notional mínimo e ao
+        saldo em USDT, e executa a compra a mercado.
+        """
+        # O saldo em USDT é consultado enquanto o preço é obtido
+        saldo_futuro = self._pool.submit(self.verificar_saldo, "USDT")
 
-                return resultado
+        step_size = lot_size.step_size
+        min_qty = lot_size.min_qty
+        min_notional = float(min_notional)
 
-            elif ordem_tipo == "sell":
+        # Verifica e ajusta a quantidade de acordo com o step_size
+        quantidade_ajustada_str = self._ajustar_quantidade(quantidade, step_size)
+        quantidade_ajustada = float(quantidade_ajustada_str)
 
-                quantidade = float(quantidade)
-                preco_atual = float(
-                    self.client.get_symbol_ticker(symbol=symbol)["price"]
-                )
+        # Calcula o valor da ordem (preço * quantidade)
+        preco_atual = float(self.obter_preco_atual(symbol))
+        notional = preco_atual * quantidade_ajustada
 
-                quantidade_maxima = float(self.verificar_saldo_moedas(symbol))
+        # Verifica se o valor (notional) está acima do mínimo exigido
+        if notional < min_notional:
+            logger.error(
+                f"Valor da ordem ({notional}) é menor que o valor mínimo permitido ({min_notional}) para {symbol}."
+            )
 
-                if quantidade_maxima == 0:
-                    quantidade_maxima = quantidade
-                else:
-                    quantidade = quantidade_maxima
+            # Forçar a quantidade ajustada para garantir que o notional seja maior que o mínimo
+            # (margem de 20%)
+            quantidade_ajustada_str = self._ajustar_quantidade(
+                min_notional / preco_atual * 1.2, step_size
+            )
+            quantidade_ajustada = float(quantidade_ajustada_str)
 
-                if quantidade > quantidade_maxima:
-                    quantidade = quantidade_maxima
+            # Recalcular o notional após o ajuste de quantidade
+            notional = preco_atual * quantidade_ajustada
 
-                logging.info(f"Quantidade1: {quantidade}")
+            if notional < min_notional:
+                logger.error(
+                    f"Mesmo após ajuste, o valor ({notional}) é menor que o mínimo exigido ({min_notional}) para {symbol}."
+                )
+                return None
 
-                quantidade = self._ajustar_quantidade_venda(symbol, quantidade)
+        # Verifique se a quantidade ajustada está acima de minQty
+        if quantidade_ajustada < min_qty:
+            logger.error(
+                f"Quantidade ajustada ({quantidade_ajustada_str}) está abaixo do tamanho mínimo de lote permitido ({min_qty}) para {symbol}."
+            )
+            quantidade_ajustada_str = self._ajustar_quantidade(min_qty, step_size)
+            logger.info(
+                f"Quantidade ajustada para o mínimo de lote permitido: {quantidade_ajustada_str}"
+            )
 
-                logging.info(f"Quantidade2: {quantidade}")
+        saldo_disponivel = float(saldo_futuro.result())
 
-                quantidade = "{:f}".format(quantidade)
+        # Se o notional ajustado for maior que o saldo disponível, ajuste a quantidade novamente
+        if notional > saldo_disponivel:
+            # Ajustar a quantidade com base no saldo disponível
+            quantidade_ajustada_str = self._ajustar_quantidade(
+                saldo_disponivel / preco_atual * 1.001, step_size
+            )
+            notional = preco_atual * float(quantidade_ajustada_str)
 
-                logging.info(f"Quantidade3: {quantidade}")
+            logger.info(
+                f"Quantidade ajustada para o saldo disponível: {quantidade_ajustada_str}, Notional: {notional}"
+            )
 
-                retorno = self._executar_ordem_sell(symbol, quantidade, 0, 0)
+        # Verificar se o notional após o ajuste ainda é inferior ao mínimo permitido
+        if notional < min_notional:
+            logger.error(
+                f"Saldo insuficiente para executar a ordem. Notional ({notional}) é menor que o mínimo permitido ({min_notional})."
+            )
+            return None
 
-                logger.info(f"Resultado da execução da ordem de venda: {retorno}")
+        # Execução da ordem após as verificações
 
-                return retorno
+        resultado = self._executar_ordem_mercado(symbol, "BUY", quantidade_ajustada_str)
 
-            else:
-                logger.error(f"Tipo de ordem inválido: {ordem_tipo}")
-                return None
+        logger.info(f"Resultado da execução da ordem de compra: {resultado}")
 
-        except Exception as e:
-            logger.error(f"Erro ao executar ordem: {e}")
-            traceback.print_exc()
-            return None
+        return resultado
 
-    def _executar_ordem_buy(
-        self,
-        symbol: str,
-        quantidade: float,
-        stop_loss_percent: float,
-        take_profit_percent: float,
+    def _ordem_venda(
+        self, symbol: str, quantidade: float, lot_size: LotSize, min_notional: float
     ):
-        try:
+        """
+        Limita a quantidade ao saldo da moeda, ajusta ao step e executa a venda
+        a mercado.
+        """
+        quantidade_maxima = float(self.verificar_saldo_moedas(symbol))
 
-            print(
-                f"Executando ordem de compra para {symbol} com quantidade {quantidade}"
-            )
-            # Executa a ordem de compra no mercado
-            ordem_compra = self.client.order_market_buy(
-                symbol=symbol, quantity=quantidade, recvWindow=60000
-            )
-            logger.info(f"Ordem de compra executada para {symbol}: {ordem_compra}")
+        if quantidade_maxima == 0:
+            quantidade_maxima = quantidade
+        else:
+            quantidade = quantidade_maxima
 
-            # Obtém o preço de compra
-            preco_compra = float(ordem_compra["fills"][0]["price"])
-            taxa = float(ordem_compra["fills"][0]["commission"])
+        if quantidade > quantidade_maxima:
+            quantidade = quantidade_maxima
 
-            return preco_compra, taxa
+        logger.debug("Quantidade1: %s", quantidade)
 
-        except BinanceAPIException as e:
-            logger.error(f"Erro ao executar ordem de compra: {e}")
-            traceback.print_exc()
-            return None
+        quantidade = self._ajustar_quantidade_venda(symbol, quantidade, lot_size)
 
-    def _executar_ordem_sell(
-        self,
-        symbol: str,
-        quantidade: float,
-        stop_loss_percent: float,
-        take_profit_percent: float,
-    ):
-        try:
+        logger.debug("Quantidade2: %s", quantidade)
 
-            logging.info(
-                f"Executando ordem de venda para {symbol} com quantidade {quantidade}"
-            )
+        # Com as casas do step, já calculadas com os filtros: "{:f}" cortaria
+        # em 6 casas decimais
+        quantidade = f"{quantidade:.{lot_size.casas}f}"
 
-            try:
-                # Executa a ordem de venda no mercado
-                ordem_venda = self.client.order_market_sell(
-                    symbol=symbol, quantity=quantidade, recvWindow=60000
-                )
-                logger.info(f"Ordem de venda executada para {symbol}: {ordem_venda}")
-            except BinanceAPIException as e:
-                quantidade = float(self.verificar_saldo_moedas(symbol))
-                ajustar_quantidade = self._ajustar_quantidade_venda(symbol, quantidade)
+        logger.debug("Quantidade3: %s", quantidade)
 
-                ordem_venda = self.client.order_market_sell(
-                    symbol=symbol, quantity=ajustar_quantidade, recvWindow=60000
-                )
+        retorno = self._executar_ordem_mercado(symbol, "SELL", quantidade)
 
-                logger.info(f"Ordem de venda executada para {symbol}: {ordem_venda} ")
+        logger.info(f"Resultado da execução da ordem de venda: {retorno}")
 
-            # Obtém o preço de venda
-            preco_venda = float(ordem_venda["fills"][0]["price"])
+        return retorno
 
-            taxa = float(ordem_venda["fills"][0]["commission"])
+    def _executar_ordem_mercado(self, symbol: str, side: str, quantidade):
+        """
+        Executa uma ordem a mercado (side "BUY" ou "SELL") e retorna
+        (preço médio ponderado, taxa total) dos fills, ou None em caso de erro.
+        Na venda, se a Binance recusar a quantidade, tenta de novo com o saldo
+        real da moeda.
+        """
+        acao = "compra" if side == "BUY" else "venda"
+        enviar_ordem = getattr(self.client, f"order_market_{side.lower()}")
 
-            if taxa is None:
-                taxa = 0.0
+        logger.info(
+            f"Executando ordem de {acao} para {symbol} com quantidade {quantidade}"
+        )
+        try:
+            try:
+                ordem = enviar_ordem(
+                    symbol=symbol, quantity=quantidade, recvWindow=RECV_WINDOW_ORDENS
+                )
+            except BinanceAPIException:
+                if side == "BUY":
+                    raise
+                lot_size, _ = self._get_lot_size_and_min_notional(symbol)
+                quantidade = self._ajustar_quantidade_venda(
+                    symbol, float(self.verificar_saldo_moedas(symbol)), lot_size
+                )
+                # Com as casas do step, como em _ordem_venda: str() do float
+                # mandaria "1e-05" ou o resíduo binário
+                quantidade = f"{quantidade:.{lot_size.casas}f}"
+                ordem = enviar_ordem(
+                    symbol=symbol, quantity=quantidade, recvWindow=RECV_WINDOW_ORDENS
+                )
+            logger.info(f"Ordem de {acao} executada para {symbol}: {ordem}")
+            if not self._acompanhando_saldos:
+                # Sem o user data stream, os saldos da rodada ficaram velhos
+                self._saldos.clear()
 
-            return preco_venda, taxa
+            return preco_medio_ordem(ordem)
 
-        except Exception as e2:
-            logger.error(f"Erro ao executar ordem de venda: {e2}")
+        except Exception as e:
+            logger.exception(f"Erro ao executar ordem de {acao}: {e}")
+            self._verificar_filtros(e)
             return None
 
+    @staticmethod
+    def _verificar_filtros(erro: Exception) -> None:
+        # Ordem recusada por filtro: o exchange info em cache pode estar velho
+        if (
+            isinstance(erro, BinanceAPIException)
+            and erro.code in CODIGOS_FILTRO_DESATUALIZADO
+        ):
+            invalidar_exchange_info()
+
+    def _formatar_preco(self, symbol: str, preco: float) -> str:
+        """
+        Arredonda o preço para baixo ao tickSize do símbolo (PRICE_FILTER), em
+        Decimal, e o formata com as casas decimais do tick.
+        """
+        filtros = obter_filtros_simbolos(self.client).get(symbol)
+        if filtros is None or filtros.tick_size is None:
+            return f"{preco:.2f}"
+
+        tick = _step_decimal(filtros.tick_size)
+        return format((Decimal(repr(preco)) // tick) * tick, "f")
+
     def _configurar_stop_loss(
-        self, symbol: str, quantidade: float, preco: float, stop_loss_percent: float
+        self,
+        symbol: str,
+        quantidade: float,
+        preco: float,
+        stop_loss_percent: float,
     ):
-        saldo_disponivel = self.verificar_saldo(
-            "USDT"
-        )  # Verifique o saldo disponível em USDT
+        """
+        Protege a posição comprada com uma ordem STOP_LOSS_LIMIT.
+        """
+        # Stop loss desligado: nenhuma consulta nem ordem
+        if not stop_loss_percent or stop_loss_percent <= 0:
+            logger.info(f"Stop loss desligado para {symbol}; nenhuma ordem enviada.")
+            return None
+
+        # A ordem vende a moeda comprada: o saldo que importa é o dela, não o
+        # de USDT, que a compra acabou de consumir
+        saldo_disponivel = float(self.verificar_saldo_moedas(symbol))
 
-        # Calcular os preços de Stop Loss e Take Profit
-        stop_loss_price = round(preco * (1 - stop_loss_percent / 100), 2)
+        # Calcular o preço do Stop Loss
+        stop_loss_price = preco * (1 - stop_loss_percent / 100)
+        stop_loss_str = self._formatar_preco(symbol, stop_loss_price)
 
         try:
             # Ajustar a quantidade com o step_size correto
             lot_size, _ = self._get_lot_size_and_min_notional(symbol)
             quantidade_ajustada_str = self._ajustar_quantidade(
-                quantidade, lot_size["step_size"]
+                quantidade, lot_size.step_size
             )
 
             # Verifique se há saldo suficiente para configurar a ordem de Stop Loss
-            if saldo_disponivel < (float(quantidade_ajustada_str) * stop_loss_price):
+            if saldo_disponivel < float(quantidade_ajustada_str):
                 logger.error(
-                    f"Saldo insuficiente para configurar o Stop Loss para {symbol}. Saldo disponível: {saldo_disponivel}, necessário: {float(quantidade_ajustada_str) * stop_loss_price}"
+                    f"Saldo insuficiente para configurar o Stop Loss para {symbol}. Saldo disponível: {saldo_disponivel}, necessário: {quantidade_ajustada_str}"
                 )
                 return None
 
             # Cria a ordem de Stop Loss com a quantidade ajustada
-            ordem_stop_loss = self.client.create_order(
+            self.client.create_order(
                 symbol=symbol,
                 side="SELL",
                 type="STOP_LOSS_LIMIT",
                 quantity=quantidade_ajustada_str,  # Usar a quantidade ajustada
-                price=stop_loss_price,
-                stopPrice=stop_loss_price,
+                price=stop_loss_str,
+                stopPrice=stop_loss_str,
                 timeInForce="GTC",
+                recvWindow=RECV_WINDOW_ORDENS,
             )
             logger.info(
-                f"Ordem de Stop Loss configurada para {symbol} ao preço: {stop_loss_price}"
+                f"Ordem de Stop Loss configurada para {symbol} ao preço: {stop_loss_str}"
             )
 
         except BinanceAPIException as e:
             logger.error(f"Erro ao configurar Stop Loss e Take Profit: {e}")
+            self._verificar_filtros(e)
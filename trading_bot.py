@@ -1,24 +1,27 @@
+import asyncio
 import logging
 import os
 import re
+import threading
 import time
-import traceback
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from decimal import Decimal, ROUND_DOWN, ROUND_UP
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, Iterable, Optional, Tuple
 
+from binance import ThreadedWebsocketManager
 from binance.client import Client
 from binance.exceptions import BinanceAPIException
 
-from data_handler import DataHandler
-from database_manager import DatabaseManager
-from indicator_calculator import IndicatorCalculator
+from binance_client import get_client
+from data_handler import DataHandler, _interval_seconds
+from database_manager import obter_database_manager
+from exchange_info import obter_indice_simbolos
+from indicator_calculator import IncrementalIndicators, IndicatorCalculator
+from indicator_kernels import desvio_padrao_welford
 from sentiment_analyzer import SentimentAnalyzer
 from telegram_notifier import TelegramNotifier
 from trade_executor import TradeExecutor
-from datetime import datetime, timedelta
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression
 import numpy as np
 import json
 
@@ -26,6 +29,26 @@ import json
 logger = logging.getLogger(__name__)
 
 
+# Segundos de espera após o fechamento da vela, para que a Binance já a tenha
+# consolidado quando as klines forem consultadas
+MARGEM_FECHAMENTO = 2
+
+# Colunas lidas por obter_indicadores (SMA50/SMA200 são opcionais)
+_COLUNAS_INDICADORES = (
+    "RSI",
+    "Momentum",
+    "close",
+    "BB_upper",
+    "BB_lower",
+    "Volume",
+    "SMA50",
+    "SMA200",
+    "VWAP",
+    "EMA1",
+    "EMA2",
+)
+
+
 class TradingBot:
     def __init__(
         self,
@@ -40,8 +63,9 @@ class TradingBot:
         interval_venda: str = Client.KLINE_INTERVAL_1MINUTE,
         modo="moderado",
         timestamp_file="timestamps.json",
+        max_paralelo: int = 4,
     ) -> None:
-        self.client = Client(api_key=binance_api_key, api_secret=binance_secret_key)
+        self.client = get_client(binance_api_key, binance_secret_key)
         self.client.time_sync = True
         self.data_handler_compra = DataHandler(self.client, interval_compra)
         self.data_handler_venda = DataHandler(self.client, interval_venda)
@@ -50,33 +74,163 @@ class TradingBot:
             openai_api_key, cryptocompare_api_key
         )
         self.trade_executor = TradeExecutor(self.client)
-        self.database_manager = DatabaseManager()
+        self.database_manager = obter_database_manager()
         telegram_token = os.getenv("TELEGRAM_BOT_TOKEN")
         telegram_chat_id = os.getenv("TELEGRAM_CHAT_ID")
         self.telegram_notifier = TelegramNotifier(telegram_token, telegram_chat_id)
         self.symbols = symbols
+        # Pares materializados uma única vez para iterações repetidas
+        self._simbolos = tuple(symbols)
         self.casas_decimais = casas_decimais
         self.min_notional = min_notional
         self.modo = modo
         self.timestamp_file = timestamp_file
         self.ultimo_timestamp = self.carregar_timestamps()
+        # Última execução neste processo pelo relógio monotônico (imune a ajustes
+        # do relógio do sistema); o epoch persistido cobre reinícios do bot
+        self._ultima_execucao_ns: Dict[str, int] = {}
+        self._lock_timestamps = threading.Lock()
+        self._rate_limit_parallel = max_paralelo
+        # Estado dos indicadores por símbolo, atualizado vela a vela
+        self._indicadores_incrementais: Dict[str, IncrementalIndicators] = {}
+        # Saldo em USDT compartilhado pelos símbolos de uma mesma rodada
+        self._saldo_usdt: Optional[float] = None
+        self._lock_saldo = threading.Lock()
+
+    async def executar_estrategias(
+        self, symbols: Optional[Iterable[str]] = None, manter_sessao: bool = False
+    ):
+        """
+        Executa a estratégia para vários símbolos em paralelo.
+        Os dados de mercado são obtidos de uma só vez e cada símbolo roda em uma
+        thread, limitado por um semáforo para respeitar os limites da Binance.
+        Com manter_sessao, a sessão HTTP das klines continua aberta para a
+        próxima rodada no mesmo event loop.
+        """
+        symbols = self._simbolos if symbols is None else tuple(symbols)
+        self._invalidar_saldo_usdt()
+        # Saldos e preços da rodada em duas consultas, junto com as klines
+        dados_mercado, _ = await asyncio.gather(
+            self.data_handler_compra.obter_dados_mercados_async(
+                symbols, manter_sessao=manter_sessao
+            ),
+            asyncio.to_thread(self._preparar_rodada, symbols),
+        )
+
+        semaforo = asyncio.Semaphore(self._rate_limit_parallel)
+
+        async def executar(symbol: str) -> None:
+            async with semaforo:
+                await asyncio.to_thread(
+                    self.iniciar_estrategia, symbol, dados_mercado.get(symbol)
+                )
+
+        await asyncio.gather(*[executar(symbol) for symbol in symbols])
 
-    def iniciar_estrategia(self, symbol: str) -> None:
+    async def executar_estrategias_agendadas(
+        self, symbols: Optional[Iterable[str]] = None
+    ) -> None:
+        """
+        Executa executar_estrategias uma vez por vela, logo após o fechamento
+        de cada vela do intervalo de compra. Acordar alinhado ao relógio da
+        Binance evita rodadas sobre velas ainda abertas e rodadas repetidas
+        sobre a mesma vela. Roda até o processo ser interrompido.
+        """
+        symbols = self._simbolos if symbols is None else tuple(symbols)
+        periodo = _interval_seconds(self.data_handler_compra.interval)
+        self.trade_executor.acompanhar_precos(symbols)
+        self.trade_executor.acompanhar_saldos()
+
+        try:
+            while True:
+                agora = time.time()
+                proximo_fechamento = (agora // periodo + 1) * periodo
+                await asyncio.sleep(proximo_fechamento + MARGEM_FECHAMENTO - agora)
+                await self.executar_estrategias(symbols, manter_sessao=True)
+        finally:
+            await self.data_handler_compra.fechar()
+            self.trade_executor.parar_streams()
+            self.database_manager.flush()
+
+    def _preparar_rodada(self, symbols: Tuple[str, ...]) -> None:
+        try:
+            self.trade_executor.preparar_rodada(symbols)
+        except Exception as e:
+            # Sem o lote, cada símbolo consulta saldo e preço individualmente
+            logger.warning(f"Não foi possível preparar a rodada: {e}")
+
+    def executar_estrategias_stream(
+        self, symbols: Optional[Iterable[str]] = None
+    ) -> None:
+        """
+        Executa a estratégia a cada vela fechada, recebida por um único
+        WebSocket multiplexado de klines da Binance, em vez de consultar a API
+        REST periodicamente. Bloqueia até o processo ser interrompido.
+        """
+        symbols = self._simbolos if symbols is None else tuple(symbols)
+        interval = self.data_handler_compra.interval
+        streams = [f"{symbol.lower()}@kline_{interval}" for symbol in symbols]
+        executor = ThreadPoolExecutor(
+            max_workers=self._rate_limit_parallel, thread_name_prefix="estrategia"
+        )
+
+        def ao_receber(mensagem: dict) -> None:
+            evento = mensagem.get("data", mensagem)
+            if evento.get("e") != "kline":
+                logger.error(f"Mensagem inesperada do WebSocket: {mensagem}")
+                return
+
+            kline = evento["k"]
+            if not kline["x"]:
+                return  # Vela ainda aberta
+
+            symbol = evento["s"]
+            try:
+                df = self.data_handler_compra.aplicar_kline_stream(symbol, kline)
+            except Exception as e:
+                logger.error(f"[{symbol}] Erro ao atualizar as klines: {e}")
+                return
+            self._invalidar_saldo_usdt()
+            executor.submit(self.iniciar_estrategia, symbol, df)
+
+        self.trade_executor.acompanhar_precos(symbols)
+        self.trade_executor.acompanhar_saldos()
+        twm = ThreadedWebsocketManager()
+        twm.start()
+        twm.start_multiplex_socket(callback=ao_receber, streams=streams)
+        logger.info(f"Aguardando velas fechadas de {len(streams)} símbolos...")
+        try:
+            twm.join()
+        finally:
+            twm.stop()
+            executor.shutdown(wait=True)
+            self.trade_executor.parar_streams()
+            self.database_manager.flush()
+
+    def iniciar_estrategia(self, symbol: str, df: Optional[Any] = None) -> None:
         """
         Inicia a estratégia de trading para um símbolo específico.
+        Se os dados de mercado já tiverem sido obtidos (ex: em lote), podem ser
+        passados em df para evitar uma nova requisição.
         """
         try:
             logger.info(f"Iniciando estratégia de trading para {symbol}...")
 
-            df = self.data_handler_compra.obter_dados_mercado(symbol)
+            if df is None:
+                df = self.data_handler_compra.obter_dados_mercado(symbol)
 
             if not df.empty:
                 # Calcula a volatilidade para o ativo
-                volatilidade = self.calcular_volatilidade(df)
+                volatilidade = self.calcular_volatilidade(
+                    df["close"].to_numpy(dtype=np.float64)
+                )
                 intervalo_minutos = self.ajustar_tatica_por_modo(volatilidade)
 
-                logging.info(
-                    f"Símbolo: {symbol}, Volatilidade: {volatilidade:.4f}, Intervalo ajustado: {intervalo_minutos} minutos"
+                logger.debug(
+                    "Símbolo: %s, Volatilidade: %.4f, Intervalo ajustado: %s minutos",
+                    symbol,
+                    volatilidade,
+                    intervalo_minutos,
                 )
 
                 # Verifica se já passou tempo suficiente desde a última execução
@@ -91,25 +245,41 @@ class TradingBot:
                     # Executar a estratégia de compra
                     self.executar_estrategia_compra(symbol, df)
 
-                    # Atualiza o timestamp para o próximo ciclo
-                    self.ultimo_timestamp[symbol] = datetime.now().isoformat()
+                    with self._lock_timestamps:
+                        # Atualiza o timestamp para o próximo ciclo
+                        self.ultimo_timestamp[symbol] = time.time()
+                        self._ultima_execucao_ns[symbol] = time.monotonic_ns()
 
-                    # Salva os timestamps no arquivo
-                    self.salvar_timestamps()
+                        # Salva os timestamps no arquivo
+                        self.salvar_timestamps()
 
         except Exception as e:
             logger.error(f"Erro ao iniciar estratégia de trading para {symbol}: {e}")
-            logger.debug(traceback.format_exc())
+            logger.debug("Traceback do erro:", exc_info=True)
+        finally:
+            # Grava as transações acumuladas neste ciclo
+            self.database_manager.flush()
 
     def carregar_timestamps(self):
         """
-        Carrega os timestamps do arquivo JSON.
+        Carrega os timestamps (epoch em segundos) do arquivo JSON.
         Se o arquivo não existir, retorna um dicionário vazio.
         """
-        if os.path.exists(self.timestamp_file):
-            with open(self.timestamp_file, "r") as f:
-                return json.load(f)
-        return {}
+        if not os.path.exists(self.timestamp_file):
+            return {}
+
+        with open(self.timestamp_file, "r") as f:
+            timestamps = json.load(f)
+
+        # Arquivos antigos guardavam strings ISO; converte uma única vez na carga
+        return {
+            symbol: (
+                datetime.fromisoformat(valor).timestamp()
+                if isinstance(valor, str)
+                else float(valor)
+            )
+            for symbol, valor in timestamps.items()
+        }
 
     def salvar_timestamps(self):
         """
@@ -118,11 +288,12 @@ class TradingBot:
         with open(self.timestamp_file, "w") as f:
             json.dump(self.ultimo_timestamp, f)
 
-    def calcular_volatilidade(self, df, periodos=14):
+    def calcular_volatilidade(self, close: np.ndarray, periodos=14):
         """
         Calcula a volatilidade com base no desvio padrão dos preços de fechamento.
+        Recebe diretamente o array de fechamentos, sem construir uma Series.
         """
-        return np.std(df["close"].tail(periodos))
+        return desvio_padrao_welford(close, periodos)
 
     def ajustar_intervalo_por_volatilidade(self, volatilidade):
         """
@@ -154,34 +325,49 @@ class TradingBot:
         """
         Verifica se já passou tempo suficiente para a próxima execução.
         """
+        ultima_ns = self._ultima_execucao_ns.get(symbol)
+        if ultima_ns is not None:
+            return time.monotonic_ns() - ultima_ns >= intervalo_minutos * 60_000_000_000
+
+        # Ainda não executou neste processo: usa o horário salvo em disco
         ultimo_timestamp = self.ultimo_timestamp.get(symbol)
         if not ultimo_timestamp:
             return True  # Primeira execução sempre retorna True
 
-        ultimo_timestamp = datetime.fromisoformat(ultimo_timestamp)
-        tempo_atual = datetime.now()
-        diferenca_tempo = tempo_atual - ultimo_timestamp
-        return diferenca_tempo >= timedelta(minutes=intervalo_minutos)
+        return time.time() - ultimo_timestamp >= intervalo_minutos * 60
 
     def calcular_stake(self, symbol: str, risco_percentual: float = 1.0) -> str:
         """
         Calcula o valor da stake com base no risco definido (porcentagem do saldo), verificando o notional mínimo.
         """
-        saldo_base = self.client.get_asset_balance(asset="USDT", recvWindow=60000)
-        saldo_disponivel = float(saldo_base["free"])
+        saldo_disponivel = self._obter_saldo_usdt()
 
         # Calcular a stake como porcentagem do saldo
         stake_valor = (risco_percentual / 100) * saldo_disponivel
 
         # Obter o preço atual do ativo
-        ticker = self.client.get_symbol_ticker(symbol=symbol)
-        preco_ativo = float(ticker["price"])
+        preco_ativo = self.trade_executor.obter_preco_atual(symbol)
 
         # Quantidade de criptomoeda a comprar com base na stake
         stake_quantidade = stake_valor / preco_ativo
 
         return self.ajustar_quantidade(symbol, stake_quantidade, preco_ativo)
 
+    def _obter_saldo_usdt(self) -> float:
+        """
+        Saldo livre em USDT, consultado uma vez por rodada de estratégias e
+        descartado após cada compra.
+        """
+        with self._lock_saldo:
+            if self._saldo_usdt is None:
+                # Sai do user data stream quando ativo, sem requisição REST
+                self._saldo_usdt = self.trade_executor.verificar_saldo("USDT")
+            return self._saldo_usdt
+
+    def _invalidar_saldo_usdt(self) -> None:
+        with self._lock_saldo:
+            self._saldo_usdt = None
+
     def calcular_preco_medio_e_quantidade_banco(
         self, symbol: str
     ) -> Tuple[float, float, float]:
@@ -208,7 +394,8 @@ class TradingBot:
         Ajusta a quantidade para atender ao passo mínimo de quantidade da Binance.
         """
         try:
-            info = self.client.get_symbol_info(symbol)
+            # Filtros do exchange info em cache, sem uma requisição por ordem
+            info = obter_indice_simbolos(self.client).get(symbol)
             if not info:
                 raise ValueError(f"Informações do símbolo {symbol} não encontradas.")
 
@@ -321,7 +508,7 @@ class TradingBot:
 
             controle_compra = float(controle_compra)
 
-            preco_atual = float(self.client.get_symbol_ticker(symbol=symbol)["price"])
+            preco_atual = self.trade_executor.obter_preco_atual(symbol)
             preco_atual = float(preco_atual)
 
             # Executar a venda de toda a quantidade acumulada
@@ -336,8 +523,6 @@ class TradingBot:
                 logger.error(f"Falha ao executar a ordem de venda para {symbol}.")
                 return
 
-            self.database_manager.deleta_stop_loss(symbol)
-
             preco_venda_real, taxa = resultado
 
             valor_total = quantidade_total_ajustada * preco_venda_real
@@ -364,9 +549,6 @@ class TradingBot:
             )
             self.telegram_notifier.enviar_mensagem(relatorio)
 
-            # Atualizar transações de compra como vendidas
-            self.database_manager.atualizar_compras(symbol)
-
             # Calcular ganhos
             ganho_total, porcentagem_ganho = self._calcular_ganhos(
                 quantidade_total_ajustada,
@@ -376,21 +558,28 @@ class TradingBot:
                 taxa,
             )
 
-            # Registrar ganhos no banco de dados
-            data_hora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            self.database_manager.registrar_ganhos(
-                data_hora,
-                symbol,
-                preco_medio_compra * quantidade_total_ajustada,
-                valor_total,
-                taxas_total_compras + taxa,
-                ganho_total,
-                porcentagem_ganho,
-                taxa,
-            )
+            # Todas as escritas da venda em uma única transação
+            with self.database_manager.batch():
+                self.database_manager.deleta_stop_loss(symbol)
+
+                # Atualizar transações de compra como vendidas
+                self.database_manager.atualizar_compras(symbol)
+
+                # Registrar ganhos no banco de dados
+                data_hora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                self.database_manager.registrar_ganhos(
+                    data_hora,
+                    symbol,
+                    preco_medio_compra * quantidade_total_ajustada,
+                    valor_total,
+                    taxas_total_compras + taxa,
+                    ganho_total,
+                    porcentagem_ganho,
+                    taxa,
+                )
 
-            # Atualizar o resumo financeiro geral
-            self._atualizar_resumo_financeiro()
+                # Atualizar o resumo financeiro geral
+                self._atualizar_resumo_financeiro()
 
             logger.info(
                 f"Venda registrada para {symbol}: Ganho de {ganho_total:.2f} USDT, porcentagem de {porcentagem_ganho:.2f}%"
@@ -398,7 +587,7 @@ class TradingBot:
 
         except Exception as e:
             logger.error(f"Erro ao executar venda para {symbol}: {e}")
-            logger.debug(traceback.format_exc())
+            logger.debug("Traceback do erro:", exc_info=True)
 
     def _ajustar_quantidade_para_notional(
         self, symbol: str, quantidade: float, min_notional_padrao: float = 10.0
@@ -410,7 +599,7 @@ class TradingBot:
             logger.info(f"Ajustando quantidade para notional para {symbol}...")
 
             # Obter o preço atual do ativo
-            preco_atual = float(self.client.get_symbol_ticker(symbol=symbol)["price"])
+            preco_atual = self.trade_executor.obter_preco_atual(symbol)
 
             # Obter o valor mínimo de notional da lista manual ou usar o valor padrão
             min_notional = self.min_notional.get(symbol, min_notional_padrao)
@@ -447,34 +636,16 @@ class TradingBot:
 
         except Exception as e:
             logger.error(f"Erro ao ajustar quantidade para notional em {symbol}: {e}")
-            logger.debug(traceback.format_exc())
+            logger.debug("Traceback do erro:", exc_info=True)
             return 0.0
 
     def verificar_saldo_moedas(self, moeda: str) -> float:
         """
-        Verifica o saldo disponível de uma moeda específica.
+        Verifica o saldo disponível de uma moeda específica. Lê os saldos do
+        TradeExecutor, mantidos pelo user data stream, e só recorre à API
+        quando a moeda ainda não está lá.
         """
-        try:
-            logger.info(f"Verificando saldo disponível em {moeda}...")
-
-            # Obter todas as informações de conta (incluindo saldo) via API da Binance
-            conta = self.client.get_account(recvWindow=60000)
-
-            # Procurar o saldo da moeda especificada
-            for asset in conta["balances"]:
-                if asset["asset"] == moeda:
-                    saldo_disponivel = float(asset["free"])
-                    logger.info(f"Saldo disponível em {moeda}: {saldo_disponivel}")
-                    return saldo_disponivel
-
-            # Se a moeda não for encontrada, retorna 0
-            logger.warning(f"Saldo para a moeda {moeda} não encontrado.")
-            return 0.0
-
-        except Exception as e:
-            logger.error(f"Erro ao verificar o saldo para a moeda {moeda}: {e}")
-            logger.debug(traceback.format_exc())
-            return 0.0
+        return float(self.trade_executor.verificar_saldo_moedas(moeda))
 
     def _calcular_ganhos(
         self,
@@ -534,6 +705,7 @@ class TradingBot:
 
         preco_compra, taxa = resultado
         logger.info(f"Preço de compra: {preco_compra}, Taxa: {taxa}")
+        self._invalidar_saldo_usdt()
 
         valor_total = float(stake) * preco_compra
         self.registrar_e_notificar_operacao(
@@ -552,12 +724,15 @@ class TradingBot:
         """
         Usa regressão linear para prever o preço futuro com base nos dados históricos de mercado.
         """
+        # Import tardio: o sklearn é pesado e só é usado aqui
+        from sklearn.linear_model import LinearRegression
+        from sklearn.model_selection import train_test_split
+
         # Selecionar colunas de interesse para o modelo (ex: preço de fechamento, volume, etc.)
-        df["timestamp"] = df["timestamp"].astype(
-            int
-        )  # Converter timestamp para inteiro
-        X = df[["timestamp"]]  # Variável independente (tempo)
-        y = df["close"]  # Variável dependente (preço)
+        # Timestamps do índice como inteiros (variável independente)
+        timestamps = df.index.asi8
+        X = timestamps.reshape(-1, 1)
+        y = df["close"].to_numpy()  # Variável dependente (preço)
 
         # Dividir os dados em conjuntos de treinamento e teste
         X_train, X_test, y_train, y_test = train_test_split(
@@ -571,9 +746,7 @@ class TradingBot:
         modelo.fit(X_train, y_train)
 
         # Prever o preço futuro (baseado no próximo timestamp)
-        proximo_timestamp = df["timestamp"].max() + (
-            df["timestamp"].iloc[-1] - df["timestamp"].iloc[-2]
-        )
+        proximo_timestamp = timestamps.max() + (timestamps[-1] - timestamps[-2])
         preco_previsto = modelo.predict([[proximo_timestamp]])
 
         logger.info(f"Previsão de preço futuro para {symbol}: {preco_previsto[0]} USDT")
@@ -586,43 +759,19 @@ class TradingBot:
             if indicadores is None:
                 return "Esperar"
 
-            rsi = indicadores["rsi"]
-            rsi_anterior = indicadores["rsi_anterior"]
-            sma50 = indicadores["sma50"]
-            sma200 = indicadores["sma200"]
-            vwap = indicadores["vwap"]
-            ultimo_preco = indicadores["ultimo_preco"]
-            preco_anterior = indicadores["preco_anterior"]
-            bb_upper = indicadores["bb_upper"]
-            bb_lower = indicadores["bb_lower"]
-            momentum = indicadores["momentum"]
-            volume_atual = indicadores["volume_atual"]
-            volume_medio = indicadores["volume_medio"]
-            ema1 = indicadores["ema1"]
-            ema2 = indicadores["ema2"]
-            ema12 = indicadores["ema12"]
-            ema22 = indicadores["ema22"]
-            close_price = indicadores["close_price"]
-
-            # Identificando níveis de suporte e resistência
-            resistencia = bb_upper if ultimo_preco < bb_upper else vwap
-            suporte = bb_lower if ultimo_preco > bb_lower else vwap
-
-            sentimento = sentimento.lower()
-            positivo = "positivo" in sentimento
-            negativo = "negativo" in sentimento
-
-            if sentimento == "neutro":
-                if ema1 > ema2 and ema12 < ema22:
-                    return "Comprar"
-            else:
-                if ema1 > ema2 and ema12 < ema22:
-                    return "Comprar"
-            return "Esperar"
+            # Compra no cruzamento da EMA curta para cima da longa. Com NaN (início
+            # da série) as comparações são falsas e o resultado é esperar.
+            cruzou_para_cima = (
+                indicadores["ema1"] > indicadores["ema2"]
+                and indicadores["ema12"] < indicadores["ema22"]
+            )
+
+            # O sentimento ainda não altera a decisão (neutro ou não, a regra
+            # é a mesma)
+            return "Comprar" if cruzou_para_cima else "Esperar"
 
         except Exception as e:
-            logger.error(f"Erro na estratégia de trading: {e}")
-            traceback.print_exc()
+            logger.exception(f"Erro na estratégia de trading: {e}")
             return "Esperar"
 
     def registrar_e_notificar_operacao(
@@ -673,7 +822,7 @@ class TradingBot:
             if not df.empty:
 
                 # Calcular indicadores
-                df = self.indicator_calculator.calcular_indicadores(df)
+                df = self.calcular_indicadores(symbol, df)
 
                 # Analisar sentimento
                 # sentimento = self.sentiment_analyzer.analisar_sentimento(value)
@@ -692,17 +841,21 @@ class TradingBot:
                     if preco_compra is not None:
                         logger.info(f"Compra executada para {symbol}: {preco_compra}")
 
-                    preco_medio, quantidade_total, taxa_total = (
-                        self.database_manager.obter_transacoes_totais(symbol, "COMPRA")
-                    )
+                    # A compra registrada e o novo stop-loss em um único commit
+                    with self.database_manager.batch():
+                        preco_medio, quantidade_total, taxa_total = (
+                            self.database_manager.obter_transacoes_totais(
+                                symbol, "COMPRA"
+                            )
+                        )
 
-                    self.database_manager.salvar_stop_loss(
-                        symbol, preco_medio * 0.97, preco_medio
-                    )
+                        self.database_manager.salvar_stop_loss(
+                            symbol, preco_medio * 0.97, preco_medio
+                        )
 
         except Exception as e:
             logger.error(f"Erro inesperado no símbolo {symbol}: {e}")
-            logger.debug(traceback.format_exc())
+            logger.debug("Traceback do erro:", exc_info=True)
 
     def executar_estrategia_venda(self, symbol, df) -> None:
         try:
@@ -710,7 +863,7 @@ class TradingBot:
             if not df.empty:
 
                 # Calcular indicadores
-                df = self.indicator_calculator.calcular_indicadores(df)
+                df = self.calcular_indicadores(symbol, df)
 
                 # Obter o stop-loss atual do banco de dados
                 stop_loss_atual, preco_maximo = self.database_manager.obter_stop_loss(
@@ -741,7 +894,23 @@ class TradingBot:
 
         except Exception as e:
             logger.error(f"Erro inesperado no símbolo {symbol}: {e}")
-            logger.debug(traceback.format_exc())
+            logger.debug("Traceback do erro:", exc_info=True)
+
+    def calcular_indicadores(self, symbol: str, df):
+        """
+        Calcula os indicadores técnicos do símbolo, processando apenas as velas
+        novas desde a última execução.
+        """
+        estado = self._indicadores_incrementais.get(symbol)
+        if estado is None:
+            estado = self._indicadores_incrementais.setdefault(
+                symbol,
+                IncrementalIndicators(
+                    self.indicator_calculator.rsi_length,
+                    self.indicator_calculator.momentum_length,
+                ),
+            )
+        return estado.aplicar(df)
 
     def obter_indicadores(self, df):
         """
@@ -753,29 +922,38 @@ class TradingBot:
                 logger.warning("Dados insuficientes para calcular indicadores.")
                 return None
 
+            # Penúltimo e último valor de cada coluna, lidos direto dos arrays em
+            # vez de um Series por indicador
+            u = {
+                coluna: df[coluna].to_numpy()[-2:]
+                for coluna in _COLUNAS_INDICADORES
+                if coluna in df.columns
+            }
+            sem_valor = (None, None)
+
             indicadores = {
-                "rsi": df["RSI"].iloc[-1],
-                "rsi_anterior": df["RSI"].iloc[-2],
-                "momentum": df["Momentum"].iloc[-1],
-                "ultimo_preco": df["close"].iloc[-1],
-                "bb_upper": df["BB_upper"].iloc[-1],
-                "bb_lower": df["BB_lower"].iloc[-1],
-                "volume_atual": df["Volume"].iloc[-1],
+                "rsi": u["RSI"][1],
+                "rsi_anterior": u["RSI"][0],
+                "momentum": u["Momentum"][1],
+                "ultimo_preco": u["close"][1],
+                "bb_upper": u["BB_upper"][1],
+                "bb_lower": u["BB_lower"][1],
+                "volume_atual": u["Volume"][1],
                 "volume_medio": df["Volume"].mean(),
-                "sma50": df["SMA50"].iloc[-1] if "SMA50" in df.columns else None,
-                "sma200": df["SMA200"].iloc[-1] if "SMA200" in df.columns else None,
-                "vwap": df["VWAP"].iloc[-1],
-                "preco_anterior": df["close"].iloc[-2],
-                "ema1": df["EMA1"].iloc[-1],
-                "ema2": df["EMA2"].iloc[-1],
-                "ema12": df["EMA1"].iloc[-2],
-                "ema22": df["EMA2"].iloc[-2],
-                "close_price": df["CLOSE_PRICE"].iloc[-1],
+                "sma50": u.get("SMA50", sem_valor)[1],
+                "sma200": u.get("SMA200", sem_valor)[1],
+                "vwap": u["VWAP"][1],
+                "preco_anterior": u["close"][0],
+                "ema1": u["EMA1"][1],
+                "ema2": u["EMA2"][1],
+                "ema12": u["EMA1"][0],
+                "ema22": u["EMA2"][0],
+                "close_price": df.attrs.get("close_price", u["close"][1]),
             }
             return indicadores
         except Exception as e:
             logger.error(f"Erro ao obter indicadores: {e}")
-            logger.debug(traceback.format_exc())
+            logger.debug("Traceback do erro:", exc_info=True)
             return None
 
     def obter_dados_mercado(self, df):
@@ -818,7 +996,7 @@ class TradingBot:
         Analisa o desempenho da venda verificando o comportamento do preço após a venda.
         """
         # Obter o preço atual para análise
-        preco_atual = float(self.client.get_symbol_ticker(symbol=symbol)["price"])
+        preco_atual = self.trade_executor.obter_preco_atual(symbol)
         diferenca = preco_atual - preco_venda
         desempenho = "subiu" if diferenca > 0 else "caiu"
 
@@ -831,12 +1009,17 @@ class TradingBot:
 
             if not df.empty:
                 # Calcula a volatilidade para o símbolo atual
-                volatilidade = self.calcular_volatilidade(df)
+                volatilidade = self.calcular_volatilidade(
+                    df["close"].to_numpy(dtype=np.float64)
+                )
                 intervalo_minutos = self.ajustar_intervalo_por_volatilidade(
                     volatilidade
                 )
-                logging.info(
-                    f"Símbolo: {symbol}, Volatilidade: {volatilidade:.4f}, Intervalo ajustado: {intervalo_minutos} minutos"
+                logger.debug(
+                    "Símbolo: %s, Volatilidade: %.4f, Intervalo ajustado: %s minutos",
+                    symbol,
+                    volatilidade,
+                    intervalo_minutos,
                 )
 
                 # Verifica se já passou tempo suficiente desde a última execução
@@ -846,7 +1029,9 @@ class TradingBot:
                     df = self.data_handler_compra.obter_dados_mercado(symbol)
 
                     # Calcula a volatilidade
-                    volatilidade = self.calcular_volatilidade(df)
+                    volatilidade = self.calcular_volatilidade(
+                        df["close"].to_numpy(dtype=np.float64)
+                    )
 
                     # Ajusta o percentual de stop loss baseado na volatilidade
                     percentual_stop_loss = self.ajustar_percentual_stop_loss(
@@ -869,9 +1054,7 @@ class TradingBot:
                     if preco_medio > 0 and quantidade_total > 0:
 
                         # Obtém o preço atual
-                        preco_atual = float(
-                            self.client.get_symbol_ticker(symbol=symbol)["price"]
-                        )
+                        preco_atual = self.trade_executor.obter_preco_atual(symbol)
 
                         logger.info(f"Preço atual para {symbol}: {preco_atual:.8f}")
 
@@ -901,12 +1084,6 @@ class TradingBot:
 
         logger.info("Atualização do stop loss concluída")
 
-    def calcular_volatilidade(self, df, periodos=14):
-        """
-        Calcula a volatilidade com base no desvio padrão dos preços de fechamento.
-        """
-        return np.std(df["close"].tail(periodos))
-
     def ajustar_percentual_stop_loss(self, volatilidade):
         """
         Ajusta o percentual de stop loss com base na volatilidade.
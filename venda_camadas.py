@@ -1,6 +1,9 @@
 import logging
 from binance.client import Client
 
+from binance_client import RECV_WINDOW_ORDENS
+from trade_executor import preco_medio_ordem
+
 logger = logging.getLogger(__name__)
 
 
@@ -35,10 +38,9 @@ class VendaExecutorCamadas:
         """
         try:
             ordem = self.client.order_market_sell(
-                symbol=symbol, quantity=quantidade, recvWindow=60000
+                symbol=symbol, quantity=quantidade, recvWindow=RECV_WINDOW_ORDENS
             )
-            preco_venda = float(ordem["fills"][0]["price"])
-            taxa = float(ordem["fills"][0]["commission"])
+            preco_venda, taxa = preco_medio_ordem(ordem)
 
             # Registra a transação no banco
             self.db_manager.registrar_transacao(
@@ -80,7 +82,7 @@ class VendaExecutorCamadas:
                 price=str(stop_loss_price),
                 stopPrice=str(stop_loss_price),
                 timeInForce="GTC",
-                recvWindow=60000,
+                recvWindow=RECV_WINDOW_ORDENS,
             )
 
             logger.info(f"Trailing stop configurado para {symbol} a {stop_loss_price}.")